@@ -0,0 +1,355 @@
+"""
+Синтетическая база в масштабе продакшена: компании, клиенты и история общения
+с кириллическими именами, телефонами компаний в разных записях и перекосом статусов,
+как у живых операторов. При одном и том же --seed получается одна и та же
+база (даты отсчитываются от момента генерации).
+
+    python -m bench.dataset --url sqlite+aiosqlite:///big.db --companies 100000 \\
+        --clients 100000 --interactions 200000 [--seed 1]
+
+База должна быть пустой: схема создаётся migrations.upgrade_schema, строки
+вставляются пачками мимо ORM, а производные данные (phone_digits, суффиксы
+телефонов, последнее общение клиента, счётчики, дневные агрегаты) заполняются
+так же, как их заполнило бы приложение.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from random import Random
+from typing import Sequence, TypeVar
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:bench")
+
+from sqlalchemy import Connection, bindparam, func, insert, select, text, update  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncEngine  # noqa: E402
+
+from counters import rebuild_counters  # noqa: E402
+from db import make_engine  # noqa: E402
+from migrations import upgrade_schema  # noqa: E402
+from models import (  # noqa: E402
+    Client,
+    ClientStatus,
+    Company,
+    CompanySource,
+    CompanyStatus,
+    Interaction,
+    InteractionResult,
+    InterestLevel,
+    PhoneSuffix,
+    PriorityLevel,
+    Suggestion,
+    SuggestionType,
+    comment_preview,
+    copy_company_filters,
+    normalize_phone,
+    normalize_phone_for_search,
+    phone_suffix_rows,
+)
+from rollups import roll_up  # noqa: E402
+
+CHUNK_SIZE = 5000
+HISTORY_DAYS = 365
+
+T = TypeVar("T")
+
+MALE_NAMES = ("Алексей", "Арман", "Дмитрий", "Ерлан", "Кайрат", "Марат", "Нурлан", "Сергей", "Тимур", "Ёлдос")
+FEMALE_NAMES = ("Айгерим", "Анна", "Асель", "Жанна", "Ирина", "Мария", "Наталья", "Ольга", "Светлана", "Юлия")
+LAST_NAMES = (
+    "Иванов", "Ахметов", "Смирнов", "Жумабаев", "Ким", "Кузнецов", "Нурланов", "Попов",
+    "Сериков", "Васильев", "Токаев", "Фёдоров", "Омаров", "Павлов", "Есенов", "Соколов",
+)
+COMPANY_FORMS = ("ТОО", "ИП", "ООО", "АО")
+COMPANY_WORDS = (
+    "Альфа", "Сервис", "Строй", "Мед", "Дент", "Авто", "Торг", "Профи", "Лидер", "Восток",
+    "Капитал", "Эксперт", "Стиль", "Глобал", "Север", "Кама", "Уют", "Вкус", "Техно", "Сити",
+)
+CITIES = (
+    "Алматы", "Астана", "Шымкент", "Караганда", "Актобе", "Тараз", "Павлодар",
+    "Усть-Каменогорск", "Семей", "Атырау", "Костанай", "Кызылорда",
+)
+NICHES = (
+    "Стоматология", "Автосервис", "Салон красоты", "Кафе", "Фитнес", "Юридические услуги",
+    "Недвижимость", "Образование", "Строительство", "Доставка еды",
+)
+OPERATOR_CODES = ("700", "701", "702", "705", "707", "708", "747", "771", "775", "777", "778")
+CLIENT_SOURCES = ("звонок", "сайт", "рекомендация", "Instagram", "2ГИС", "другое")
+COMMENTS = (
+    "Перезвонить после обеда",
+    "Просили прислать коммерческое предложение на почту",
+    "Не дозвонились, занято",
+    "Интересуется ценой, обещали подумать до конца недели",
+    "Договорились о встрече в офисе",
+    "Директор в отпуске, звонить через две недели",
+    "Отказ: уже работают с конкурентом",
+    "",
+)
+
+# Распределения, похожие на рабочую базу: большинство записей так и остаётся в начале воронки
+CLIENT_STATUS_WEIGHTS = {
+    ClientStatus.NEW: 40,
+    ClientStatus.PLANNED_CALL: 10,
+    ClientStatus.NO_ANSWER: 15,
+    ClientStatus.THINKING: 15,
+    ClientStatus.AGREED: 8,
+    ClientStatus.DECLINED: 12,
+}
+INTEREST_WEIGHTS = {InterestLevel.COLD: 60, InterestLevel.WARM: 30, InterestLevel.HOT: 10}
+COMPANY_STATUS_WEIGHTS = {
+    CompanyStatus.NOT_CALLED: 55,
+    CompanyStatus.RESEARCH: 10,
+    CompanyStatus.NO_ANSWER: 12,
+    CompanyStatus.NEGOTIATION: 10,
+    CompanyStatus.CLIENT: 5,
+    CompanyStatus.DECLINED: 8,
+}
+PRIORITY_WEIGHTS = {PriorityLevel.LOW: 50, PriorityLevel.MEDIUM: 35, PriorityLevel.HIGH: 15}
+SOURCE_WEIGHTS = {CompanySource.FOUND: 70, CompanySource.RECOMMENDATION: 20, CompanySource.INBOUND: 10}
+RESULT_WEIGHTS = {InteractionResult.CALL: 70, InteractionResult.MESSAGE: 25, InteractionResult.MEETING: 5}
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    companies: int
+    clients: int
+    interactions: int
+    seed: int = 1
+
+    @classmethod
+    def for_size(cls, rows: int, seed: int = 1) -> DatasetSpec:
+        """Размер бенчмарка: rows компаний и клиентов и вдвое больше записей истории."""
+        return cls(companies=rows, clients=rows, interactions=rows * 2, seed=seed)
+
+
+def _weighted(rng: Random, weights: dict[T, int]) -> T:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _skewed(rng: Random, values: Sequence[T]) -> T:
+    # Первые значения встречаются чаще: большой город, популярная ниша
+    return rng.choices(values, weights=[1 / (rank + 1) for rank in range(len(values))])[0]
+
+
+def _phone(rng: Random, serial: int) -> str:
+    # Номер однозначно выводится из serial (7919 взаимно просто с 10**7), код оператора любой
+    number = f"{serial * 7919 % 10**7:07d}"
+    code = rng.choice(OPERATOR_CODES)
+    layout = rng.randrange(4)
+    if layout == 0:
+        return f"+7 ({code}) {number[:3]}-{number[3:5]}-{number[5:]}"
+    if layout == 1:
+        return f"8 {code} {number[:3]} {number[3:5]} {number[5:]}"
+    if layout == 2:
+        return f"8{code}{number}"
+    return f"+7{code}{number}"
+
+
+def _person(rng: Random) -> str:
+    last_name = rng.choice(LAST_NAMES)
+    if rng.random() < 0.5:
+        return f"{rng.choice(MALE_NAMES)} {last_name}"
+    # Женская форма фамилии: Иванов -> Иванова, Ким не меняется
+    if last_name.endswith(("ов", "ев", "ин")):
+        last_name += "а"
+    return f"{rng.choice(FEMALE_NAMES)} {last_name}"
+
+
+def _company_name(rng: Random) -> str:
+    return f'{rng.choice(COMPANY_FORMS)} "{rng.choice(COMPANY_WORDS)}{rng.choice(COMPANY_WORDS).lower()}"'
+
+
+def _moment(rng: Random, now: datetime, since: datetime | None = None) -> datetime:
+    start = since or now - timedelta(days=HISTORY_DAYS)
+    span = max(int((now - start).total_seconds()), 1)
+    return start + timedelta(seconds=rng.randrange(span))
+
+
+def _chunks(rows: list[dict]) -> list[list[dict]]:
+    return [rows[i : i + CHUNK_SIZE] for i in range(0, len(rows), CHUNK_SIZE)]
+
+
+def _insert_suggestions(connection: Connection) -> None:
+    rows = [{"type": SuggestionType.CITY, "value": value} for value in CITIES]
+    rows += [{"type": SuggestionType.NICHE, "value": value} for value in NICHES]
+    connection.execute(insert(Suggestion), rows)
+
+
+def _insert_companies(connection: Connection, spec: DatasetSpec, now: datetime) -> None:
+    rng = Random(f"{spec.seed}:companies")
+    for start in range(1, spec.companies + 1, CHUNK_SIZE):
+        rows, suffixes = [], []
+        for company_id in range(start, min(start + CHUNK_SIZE, spec.companies + 1)):
+            phone = _phone(rng, 10**6 + company_id) if rng.random() < 0.8 else None
+            digits = normalize_phone_for_search(phone) or None
+            created_at = _moment(rng, now)
+            rows.append(
+                {
+                    "id": company_id,
+                    "name": _company_name(rng),
+                    "city": _skewed(rng, CITIES) if rng.random() < 0.9 else None,
+                    "niche": _skewed(rng, NICHES) if rng.random() < 0.85 else None,
+                    "phone": phone,
+                    "phone_digits": digits,
+                    "site": None,
+                    "source": _weighted(rng, SOURCE_WEIGHTS),
+                    "status": _weighted(rng, COMPANY_STATUS_WEIGHTS),
+                    "priority": _weighted(rng, PRIORITY_WEIGHTS),
+                    "contact_person": _person(rng) if rng.random() < 0.5 else None,
+                    "note": rng.choice(COMMENTS) or None,
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                }
+            )
+            suffixes.extend(phone_suffix_rows("company", company_id, digits))
+        connection.execute(insert(Company), rows)
+        for chunk in _chunks(suffixes):
+            connection.execute(insert(PhoneSuffix), chunk)
+
+
+def _insert_clients(connection: Connection, spec: DatasetSpec, now: datetime) -> list[datetime]:
+    """Возвращает даты создания клиентов (по id) — история начинается не раньше них."""
+    rng = Random(f"{spec.seed}:clients")
+    created: list[datetime] = [now]
+    for start in range(1, spec.clients + 1, CHUNK_SIZE):
+        rows, suffixes = [], []
+        for client_id in range(start, min(start + CHUNK_SIZE, spec.clients + 1)):
+            # Бот хранит номер клиента нормализованным, компании — как ввёл оператор
+            phone = normalize_phone(_phone(rng, client_id))
+            digits = normalize_phone_for_search(phone)
+            created_at = _moment(rng, now)
+            created.append(created_at)
+            next_contact = None
+            if rng.random() < 0.2:
+                next_contact = now + timedelta(minutes=rng.randrange(-3 * 24 * 60, 7 * 24 * 60))
+            company_id = None
+            if spec.companies and rng.random() < 0.7:
+                company_id = rng.randint(1, spec.companies)
+            rows.append(
+                {
+                    "id": client_id,
+                    "phone": phone,
+                    "phone_digits": digits,
+                    "name": _person(rng) if rng.random() < 0.9 else None,
+                    "company_id": company_id,
+                    "source": rng.choice(CLIENT_SOURCES),
+                    "status": _weighted(rng, CLIENT_STATUS_WEIGHTS),
+                    "interest": _weighted(rng, INTEREST_WEIGHTS),
+                    "next_contact_at": next_contact,
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                }
+            )
+            suffixes.extend(phone_suffix_rows("client", client_id, digits))
+        connection.execute(insert(Client), rows)
+        for chunk in _chunks(suffixes):
+            connection.execute(insert(PhoneSuffix), chunk)
+    connection.execute(copy_company_filters())
+    return created
+
+
+def _insert_interactions(
+    connection: Connection, spec: DatasetSpec, now: datetime, client_created: list[datetime]
+) -> dict[int, dict]:
+    """Вставляет историю и возвращает последнее общение каждого клиента, у которого оно есть."""
+    rng = Random(f"{spec.seed}:interactions")
+    clients = list(range(1, spec.clients + 1))
+    latest: dict[int, dict] = {}
+    for start in range(1, spec.interactions + 1, CHUNK_SIZE):
+        rows = []
+        for interaction_id in range(start, min(start + CHUNK_SIZE, spec.interactions + 1)):
+            # Квадрат равномерного — у части клиентов длинная история, у многих короткая
+            client_id = clients[int(rng.random() ** 2 * len(clients))]
+            created_at = _moment(rng, now, since=client_created[client_id])
+            comment = rng.choice(COMMENTS) or None
+            result = _weighted(rng, RESULT_WEIGHTS)
+            rows.append(
+                {
+                    "id": interaction_id,
+                    "client_id": client_id,
+                    "created_at": created_at,
+                    "result": result,
+                    "status_after": _weighted(rng, CLIENT_STATUS_WEIGHTS),
+                    "comment": comment,
+                }
+            )
+            previous = latest.get(client_id)
+            if previous is None or previous["at"] <= created_at:
+                latest[client_id] = {
+                    "row_id": client_id,
+                    "at": created_at,
+                    "result": result,
+                    "preview": comment_preview(comment),
+                }
+        connection.execute(insert(Interaction), rows)
+    return latest
+
+
+def _store_last_interactions(connection: Connection, latest: dict[int, dict]) -> None:
+    stmt = (
+        update(Client)
+        .where(Client.id == bindparam("row_id"))
+        .values(
+            last_interaction_at=bindparam("at"),
+            last_interaction_result=bindparam("result"),
+            last_comment_preview=bindparam("preview"),
+        )
+    )
+    for chunk in _chunks(list(latest.values())):
+        connection.execute(stmt, chunk)
+
+
+def _advance_sequences(connection: Connection) -> None:
+    # id вставлены явно, и последовательности Postgres о них не знают
+    if connection.dialect.name != "postgresql":
+        return
+    for table in ("companies", "clients", "interactions", "suggestions"):
+        connection.execute(
+            text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT coalesce(max(id), 1) FROM {table}))")
+        )
+
+
+async def generate(engine: AsyncEngine, spec: DatasetSpec) -> None:
+    await upgrade_schema(engine)
+    async with engine.connect() as conn:
+        existing = (await conn.execute(select(func.count()).select_from(Client))).scalar_one()
+    if existing:
+        raise RuntimeError("Database is not empty: the generator only fills a fresh database")
+
+    now = datetime.utcnow().replace(microsecond=0)
+    async with engine.begin() as conn:
+        await conn.run_sync(_insert_suggestions)
+        await conn.run_sync(_insert_companies, spec, now)
+    async with engine.begin() as conn:
+        client_created = await conn.run_sync(_insert_clients, spec, now)
+    async with engine.begin() as conn:
+        latest = await conn.run_sync(_insert_interactions, spec, now, client_created)
+        await conn.run_sync(_store_last_interactions, latest)
+    async with engine.begin() as conn:
+        await conn.run_sync(_advance_sequences)
+        await conn.run_sync(rebuild_counters)
+        # Бот ещё не запущен, и других писателей нет: агрегаты догоняются здесь же
+        while await conn.run_sync(roll_up):
+            pass
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--companies", type=int, default=10000)
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--interactions", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    engine = make_engine(args.url)
+    started = time.perf_counter()
+    await generate(engine, DatasetSpec(args.companies, args.clients, args.interactions, args.seed))
+    await engine.dispose()
+    print(f"Generated in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+Bot без сети для бенчмарков: настоящий Dispatcher с роутерами из handlers
+получает сконструированные апдейты, а вызовы Bot API не уходят в Telegram,
+а записываются вместе со временем.
+"""
+from __future__ import annotations
+
+import time
+from datetime import datetime, timezone
+from itertools import count
+from typing import Any, AsyncGenerator
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import EditMessageText, SendMessage, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from handlers import router
+from instrumentation import HandlerNameMiddleware
+from metrics import UPDATE_SAMPLE_KEY, UpdateSample
+
+BOT_ID = 42
+
+
+class RecordingSession(BaseSession):
+    """Отвечает на методы Bot API правдоподобными объектами и запоминает их."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list[tuple[float, TelegramMethod]] = []
+        self._message_ids = count(1)
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[TelegramType], timeout: int | None = None
+    ) -> TelegramType:
+        self.calls.append((time.perf_counter(), method))
+        if isinstance(method, (SendMessage, EditMessageText)):
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(timezone.utc),
+                chat=Chat(id=method.chat_id or 0, type="private"),
+                text=method.text,
+            )
+        return True
+
+    async def stream_content(self, *args: Any, **kwargs: Any) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+class Operator:
+    """Один оператор в личном чате с ботом: собирает апдейты от его имени."""
+
+    _update_ids = count(1)
+
+    def __init__(self, user_id: int) -> None:
+        self.user = User(id=user_id, is_bot=False, first_name=f"Оператор {user_id}")
+        self.chat = Chat(id=user_id, type="private")
+        self._bot_user = User(id=BOT_ID, is_bot=True, first_name="CRM")
+
+    def message(self, text: str) -> Update:
+        update_id = next(self._update_ids)
+        return Update(
+            update_id=update_id,
+            message=Message(
+                message_id=update_id,
+                date=datetime.now(timezone.utc),
+                chat=self.chat,
+                from_user=self.user,
+                text=text,
+            ),
+        )
+
+    def callback(self, data: str) -> Update:
+        update_id = next(self._update_ids)
+        # Кнопка под сообщением бота, которое будут редактировать
+        message = Message(
+            message_id=update_id,
+            date=datetime.now(timezone.utc),
+            chat=self.chat,
+            from_user=self._bot_user,
+            text="…",
+        )
+        return Update(
+            update_id=update_id,
+            callback_query=CallbackQuery(
+                id=str(update_id), from_user=self.user, chat_instance=str(self.chat.id), message=message, data=data
+            ),
+        )
+
+
+class FakeBot:
+    """
+    Dispatcher с обработчиками бота, как в main.py, и Bot на RecordingSession.
+    handlers.router подключается к одному Dispatcher, поэтому на процесс — один FakeBot.
+    """
+
+    def __init__(self) -> None:
+        self.session = RecordingSession()
+        self.bot = Bot(f"{BOT_ID}:FAKE", session=self.session)
+        self.dispatcher = Dispatcher(storage=MemoryStorage())
+        self.dispatcher.include_router(router)
+        for observer in (self.dispatcher.message, self.dispatcher.callback_query, self.dispatcher.inline_query):
+            observer.middleware(HandlerNameMiddleware())
+
+    async def feed(self, update: Update) -> str:
+        """Обрабатывает апдейт и возвращает имя обработчика, который его принял."""
+        # HandlerNameMiddleware допишет в образец имя обработчика, выбранного для апдейта
+        sample = UpdateSample(update.event_type)
+        await self.dispatcher.feed_update(self.bot, update, **{UPDATE_SAMPLE_KEY: sample})
+        return sample.handler
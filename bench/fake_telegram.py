@@ -0,0 +1,205 @@
+"""
+Локальная замена Bot API для нагрузочных прогонов: бот подключается к ней
+через TELEGRAM_API_URL и забирает апдейты обычным getUpdates, а ответы
+(sendMessage, editMessageText, answerCallbackQuery и прочие) записываются
+с временем получения. Для каждого чата сервер помнит последний апдейт
+оператора и ждёт ответа бота именно на него — это и есть задержка от
+апдейта до ответа. Ответом считается answerCallbackQuery на это нажатие
+или sendMessage/editMessageText в чат после того, как бот забрал апдейт;
+запоздавшие ответы на прошлые апдейты отбрасываются.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Any
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {"id": 42, "is_bot": True, "first_name": "CRM", "username": "crm_bench_bot"}
+# Сообщения бота в чат: ответ на апдейт, который бот уже забрал
+MESSAGE_METHODS = {"sendmessage", "editmessagetext"}
+
+
+@dataclass
+class ApiCall:
+    at: float
+    method: str
+    chat_id: int | None
+    params: dict[str, Any]
+
+
+@dataclass
+class PendingUpdate:
+    """Апдейт оператора, на который бот ещё не ответил."""
+
+    update_id: int
+    query_id: str | None
+    queued_at: float
+    future: asyncio.Future = field(repr=False)
+    delivered: bool = False
+
+
+class FakeTelegram:
+    """Состояние сервера: очередь апдейтов, ожидающие ответа чаты и журнал вызовов."""
+
+    def __init__(self) -> None:
+        self.calls: list[ApiCall] = []
+        # Выставляется при первом getUpdates — бот запущен и опрашивает сервер
+        self.polling = asyncio.Event()
+        # Ответы на уже отвеченные или брошенные апдейты — в задержки не попали
+        self.stale_replies = 0
+        self._updates: list[dict] = []
+        self._update_ids = count(1)
+        self._query_ids = count(1)
+        self._message_ids = count(1)
+        self._arrived = asyncio.Event()
+        # Чат -> апдейт, ответа на который ждёт оператор
+        self._waiting: dict[int, PendingUpdate] = {}
+        self._callback_chats: dict[str, int] = {}
+
+    def _user(self, chat_id: int) -> dict:
+        return {"id": chat_id, "is_bot": False, "first_name": f"Оператор {chat_id}", "language_code": "ru"}
+
+    def _chat(self, chat_id: int) -> dict:
+        return {"id": chat_id, "type": "private"}
+
+    def _push(self, chat_id: int, payload: dict, query_id: str | None = None) -> asyncio.Future:
+        if chat_id in self._waiting:
+            raise RuntimeError(f"Chat {chat_id} is still waiting for a reply")
+        update_id = next(self._update_ids)
+        self._updates.append({"update_id": update_id, **payload})
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[chat_id] = PendingUpdate(update_id, query_id, time.perf_counter(), future)
+        self._arrived.set()
+        return future
+
+    def send_text(self, chat_id: int, text: str) -> asyncio.Future:
+        """Оператор пишет боту; future получит задержку до ответа в секундах."""
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": self._chat(chat_id),
+            "from": self._user(chat_id),
+            "text": text,
+        }
+        return self._push(chat_id, {"message": message})
+
+    def press_button(self, chat_id: int, data: str) -> asyncio.Future:
+        """Оператор нажимает inline-кнопку под сообщением бота."""
+        query_id = str(next(self._query_ids))
+        self._callback_chats[query_id] = chat_id
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": self._chat(chat_id),
+            "from": BOT_USER,
+            "text": "…",
+        }
+        query = {
+            "id": query_id,
+            "from": self._user(chat_id),
+            "chat_instance": str(chat_id),
+            "message": message,
+            "data": data,
+        }
+        return self._push(chat_id, {"callback_query": query}, query_id)
+
+    def abandon(self, chat_id: int) -> None:
+        """Ответа так и не было: чат снова может слать апдейты."""
+        self._waiting.pop(chat_id, None)
+
+    async def get_updates(self, offset: int, limit: int, timeout: float) -> list[dict]:
+        self.polling.set()
+        # offset подтверждает всё, что меньше него, как в настоящем Bot API
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        delivered = self._updates[:limit]
+        update_ids = {update["update_id"] for update in delivered}
+        for pending in self._waiting.values():
+            if pending.update_id in update_ids:
+                pending.delivered = True
+        return delivered
+
+    def _answers(self, pending: PendingUpdate, method: str, query_id: str | None) -> bool:
+        if method == "answercallbackquery":
+            return query_id is not None and query_id == pending.query_id
+        return method in MESSAGE_METHODS and pending.delivered
+
+    def record(self, method: str, params: dict[str, Any]) -> Any:
+        now = time.perf_counter()
+        chat_id = params.get("chat_id")
+        query_id = params.get("callback_query_id")
+        if chat_id is None and query_id is not None:
+            chat_id = self._callback_chats.pop(query_id, None)
+        chat_id = int(chat_id) if chat_id is not None else None
+        self.calls.append(ApiCall(now, method, chat_id, params))
+        if method == "answercallbackquery" or method in MESSAGE_METHODS:
+            pending = self._waiting.get(chat_id)
+            if pending is not None and self._answers(pending, method, query_id):
+                del self._waiting[chat_id]
+                if not pending.future.done():
+                    pending.future.set_result(now - pending.queued_at)
+            else:
+                self.stale_replies += 1
+        if method in MESSAGE_METHODS:
+            return {
+                "message_id": int(params.get("message_id") or next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": self._chat(chat_id or 0),
+                "from": BOT_USER,
+                "text": params.get("text", ""),
+            }
+        if method == "getme":
+            return BOT_USER
+        return True
+
+
+def _params(form: Any) -> dict[str, Any]:
+    # Сложные поля (reply_markup, allowed_updates) aiogram присылает строкой JSON
+    params = {}
+    for key, value in form.items():
+        if isinstance(value, str) and value.startswith(("[", "{")):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        params[key] = value
+    return params
+
+
+def build_app(telegram: FakeTelegram) -> web.Application:
+    async def handle(request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        params = _params(await request.post())
+        if method == "getupdates":
+            result: Any = await telegram.get_updates(
+                int(params.get("offset") or 0), int(params.get("limit") or 100), float(params.get("timeout") or 0)
+            )
+        else:
+            result = telegram.record(method, params)
+        return web.json_response({"ok": True, "result": result})
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handle)
+    return app
+
+
+async def start_fake_telegram(host: str, port: int) -> tuple[FakeTelegram, web.AppRunner]:
+    telegram = FakeTelegram()
+    runner = web.AppRunner(build_app(telegram), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Fake Bot API on http://%s:%s", host, port)
+    return telegram, runner
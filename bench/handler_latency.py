@@ -0,0 +1,209 @@
+"""
+Задержка и число запросов горячих обработчиков на синтетической базе разного
+размера. Для каждого размера bench.dataset строит отдельную базу SQLite, затем
+настоящие обработчики получают апдейты через bench.fake_bot без сети.
+
+    python -m bench.handler_latency [--sizes 10000 100000 1000000] [--iterations 200] \\
+        [--out bench_results.json] [--baseline old_results.json]
+
+--database-url прогоняет один размер на заданной пустой базе (например, Postgres).
+Результат — JSON с p50/p95/p99 в миллисекундах и числом запросов на вызов по каждому
+обработчику; с --baseline рядом печатается изменение p95 относительно прошлого прогона.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from random import Random
+from typing import Callable
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:bench")
+
+from aiogram.types import Update  # noqa: E402
+
+from bench.dataset import (  # noqa: E402
+    COMPANY_WORDS,
+    FEMALE_NAMES,
+    MALE_NAMES,
+    OPERATOR_CODES,
+    DatasetSpec,
+    generate,
+)
+from bench.fake_bot import FakeBot, Operator  # noqa: E402
+from company_filters import CompanyFilter  # noqa: E402
+from db import engine  # noqa: E402
+from instrumentation import StatementCounter  # noqa: E402
+from models import CompanyStatus, PriorityLevel  # noqa: E402
+
+# Шаги сценария: все, кроме последнего, готовят состояние FSM и не замеряются
+Steps = Callable[[Operator, Random, DatasetSpec], list[Update]]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    handler: str
+    steps: Steps
+
+
+def _search(operator: Operator, rng: Random, spec: DatasetSpec) -> list[Update]:
+    mode = rng.choice(("phone", "name", "company"))
+    if mode == "phone":
+        query = rng.choice(OPERATOR_CODES) + str(rng.randrange(100, 1000))
+    elif mode == "name":
+        query = rng.choice(MALE_NAMES + FEMALE_NAMES)
+    else:
+        query = rng.choice(COMPANY_WORDS)
+    return [operator.callback(f"search:{mode}"), operator.message(query)]
+
+
+def _companies_page(operator: Operator, rng: Random, spec: DatasetSpec) -> list[Update]:
+    spec_filter = rng.choice(
+        (
+            CompanyFilter(),
+            CompanyFilter(status=CompanyStatus.NOT_CALLED),
+            CompanyFilter(status=CompanyStatus.NEGOTIATION, priority=PriorityLevel.HIGH),
+            CompanyFilter(city_id=1),
+        )
+    )
+    return [operator.callback(f"companies:{spec_filter.pack()}:0")]
+
+
+def _bulk_companies(operator: Operator, rng: Random, spec: DatasetSpec) -> list[Update]:
+    lines = "\n".join(f"8{rng.choice(OPERATOR_CODES)}{rng.randrange(10**7):07d}-Бенч {i}" for i in range(20))
+    return [
+        operator.message("/bulk_companies"),
+        operator.message(lines),
+        operator.message("-"),
+        # Ответ городом вызывает create_bulk_companies
+        operator.message("-"),
+    ]
+
+
+SCENARIOS = (
+    Scenario("perform_search", _search),
+    Scenario("paginate_companies", _companies_page),
+    Scenario("stats", lambda operator, rng, spec: [operator.message("📊 Статистика")]),
+    Scenario("tasks_today", lambda operator, rng, spec: [operator.message("⏰ Задачи на сегодня")]),
+    Scenario(
+        "show_client",
+        lambda operator, rng, spec: [operator.callback(f"client:{rng.randint(1, spec.clients)}")],
+    ),
+    Scenario("bulk_companies_city", _bulk_companies),
+)
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+async def measure(spec: DatasetSpec, iterations: int) -> dict:
+    """Выполняется в процессе, где DATABASE_URL указывает на пустую базу этого размера."""
+    started = time.perf_counter()
+    await generate(engine, spec)
+    report: dict = {
+        "dialect": engine.dialect.name,
+        "dataset": spec.__dict__,
+        "generated_in_s": round(time.perf_counter() - started, 1),
+        "iterations": iterations,
+    }
+
+    fake = FakeBot()
+    operator = Operator(1)
+    rng = Random(spec.seed)
+    handlers = {}
+    for scenario in SCENARIOS:
+        latencies: list[float] = []
+        queries: list[int] = []
+        for _ in range(iterations):
+            *prepare, measured = scenario.steps(operator, rng, spec)
+            for update in prepare:
+                await fake.feed(update)
+            with StatementCounter(engine) as counter:
+                started = time.perf_counter()
+                handled_by = await fake.feed(measured)
+                latencies.append((time.perf_counter() - started) * 1000)
+            if handled_by != scenario.handler:
+                raise RuntimeError(f"Update for {scenario.handler} was handled by {handled_by}")
+            queries.append(counter.count)
+        handlers[scenario.handler] = {
+            "p50_ms": round(_percentile(latencies, 50), 3),
+            "p95_ms": round(_percentile(latencies, 95), 3),
+            "p99_ms": round(_percentile(latencies, 99), 3),
+            "mean_ms": round(statistics.fmean(latencies), 3),
+            "queries_min": min(queries),
+            "queries_max": max(queries),
+        }
+    report["handlers"] = handlers
+    await engine.dispose()
+    return report
+
+
+def run_size(size: int, iterations: int, seed: int, database_url: str, out: Path) -> dict:
+    """Каждый размер — в своём процессе: движок db.engine создаётся при импорте по DATABASE_URL."""
+    command = [
+        sys.executable, "-m", "bench.handler_latency", "--child", str(size),
+        "--iterations", str(iterations), "--seed", str(seed), "--out", str(out),
+    ]
+    subprocess.run(command, env=dict(os.environ, DATABASE_URL=database_url), check=True)
+    return json.loads(out.read_text())
+
+
+def _print_report(report: dict, baseline: dict | None) -> None:
+    for size, result in report.items():
+        print(f"\n{size} rows ({result['dialect']}):")
+        for handler, values in result["handlers"].items():
+            line = (
+                f"  {handler:>20}: p50 {values['p50_ms']:8.2f}  p95 {values['p95_ms']:8.2f}  "
+                f"p99 {values['p99_ms']:8.2f} ms, queries {values['queries_min']}–{values['queries_max']}"
+            )
+            previous = (baseline or {}).get(size, {}).get("handlers", {}).get(handler)
+            if previous:
+                line += f", p95 {values['p95_ms'] / previous['p95_ms'] - 1:+.0%} vs baseline"
+            print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", type=Path, default=Path("bench_results.json"))
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--database-url", help="готовая пустая база; прогоняется только первый размер")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        report = asyncio.run(measure(DatasetSpec.for_size(args.child, args.seed), args.iterations))
+        args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    report: dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        if args.database_url:
+            size = args.sizes[0]
+            report[str(size)] = run_size(size, args.iterations, args.seed, args.database_url, workdir / f"{size}.json")
+        else:
+            for size in args.sizes:
+                database_url = f"sqlite+aiosqlite:///{workdir / f'{size}.db'}"
+                report[str(size)] = run_size(size, args.iterations, args.seed, database_url, workdir / f"{size}.json")
+    args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    _print_report(report, baseline)
+    print(f"\nSaved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
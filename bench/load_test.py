@@ -0,0 +1,190 @@
+"""
+Нагрузочный прогон бота целиком: main.py запускается отдельным процессом на
+синтетической базе (bench.dataset) и опрашивает bench.fake_telegram, а N
+операторов одновременно жмут кнопки и пишут сообщения, каждый ждёт ответа
+бота перед следующим действием. Результат — задержка от апдейта до ответа
+по действиям и устойчивая пропускная способность в апдейтах в секунду.
+
+    python -m bench.load_test [--operators 50] [--seconds 30] [--rows 10000] \\
+        [--think 0] [--out load_results.json]
+
+Потолок ищется увеличением --operators: пока апдейты/с растут вместе с числом
+операторов, бот не упёрся; когда перестают, а p95 растёт — это предел.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from random import Random
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:bench")
+
+from bench.dataset import COMPANY_WORDS, FEMALE_NAMES, MALE_NAMES, DatasetSpec, generate  # noqa: E402
+from bench.fake_telegram import FakeTelegram, start_fake_telegram  # noqa: E402
+from company_filters import CompanyFilter  # noqa: E402
+from db import make_engine  # noqa: E402
+from models import CompanyStatus  # noqa: E402
+
+BOT_TOKEN = "42:LOADTEST"
+REPLY_TIMEOUT = 30
+STARTUP_TIMEOUT = 60
+
+# Действие -> вес: примерно так операторы распределяют клики за смену
+ACTIONS = {
+    "show_client": 30,
+    "companies_page": 20,
+    "search": 15,
+    "tasks_today": 15,
+    "stats": 10,
+    "clients_page": 10,
+}
+
+
+async def operator(
+    telegram: FakeTelegram,
+    chat_id: int,
+    spec: DatasetSpec,
+    deadline: float,
+    think: float,
+    latencies: dict[str, list[float]],
+    timeouts: dict[str, int],
+) -> None:
+    rng = Random(chat_id)
+
+    async def step(name: str, future: asyncio.Future) -> None:
+        try:
+            latencies[name].append(await asyncio.wait_for(future, REPLY_TIMEOUT))
+        except asyncio.TimeoutError:
+            timeouts[name] += 1
+            telegram.abandon(chat_id)
+
+    while time.perf_counter() < deadline:
+        action = rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+        if action == "show_client":
+            await step(action, telegram.press_button(chat_id, f"client:{rng.randint(1, spec.clients)}"))
+        elif action == "companies_page":
+            spec_filter = rng.choice((CompanyFilter(), CompanyFilter(status=CompanyStatus.NOT_CALLED)))
+            await step(action, telegram.press_button(chat_id, f"companies:{spec_filter.pack()}:0"))
+        elif action == "clients_page":
+            await step(action, telegram.press_button(chat_id, f"clients:{CompanyFilter().pack()}:0"))
+        elif action == "search":
+            await step("search_menu", telegram.press_button(chat_id, "search:name"))
+            await step(action, telegram.send_text(chat_id, rng.choice(MALE_NAMES + FEMALE_NAMES + COMPANY_WORDS)))
+        elif action == "tasks_today":
+            await step(action, telegram.send_text(chat_id, "⏰ Задачи на сегодня"))
+        else:
+            await step(action, telegram.send_text(chat_id, "📊 Статистика"))
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+
+def _summary(values: list[float]) -> dict[str, float]:
+    ms = sorted(value * 1000 for value in values)
+    quantiles = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    return {
+        "count": len(ms),
+        "p50_ms": round(quantiles[49], 2),
+        "p95_ms": round(quantiles[94], 2),
+        "p99_ms": round(quantiles[98], 2),
+        "max_ms": round(ms[-1], 2),
+    }
+
+
+async def run(args: argparse.Namespace, workdir: Path) -> dict:
+    database_url = f"sqlite+aiosqlite:///{workdir / 'load.db'}"
+    spec = DatasetSpec.for_size(args.rows, args.seed)
+    engine = make_engine(database_url)
+    await generate(engine, spec)
+    await engine.dispose()
+
+    telegram, runner = await start_fake_telegram("127.0.0.1", args.port)
+    log_path = workdir / "bot.log"
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        TELEGRAM_BOT_TOKEN=BOT_TOKEN,
+        TELEGRAM_API_URL=f"http://127.0.0.1:{args.port}",
+        # Напоминания в чаты операторов только исказили бы замер
+        REMINDER_CHAT_IDS="",
+        ADMIN_IDS="",
+    )
+    with log_path.open("w") as log:
+        bot = await asyncio.create_subprocess_exec(
+            sys.executable, "main.py", env=env, stdout=log, stderr=log, cwd=Path(__file__).parent.parent
+        )
+    try:
+        await asyncio.wait_for(telegram.polling.wait(), STARTUP_TIMEOUT)
+        latencies: dict[str, list[float]] = defaultdict(list)
+        timeouts: dict[str, int] = defaultdict(int)
+        started = time.perf_counter()
+        deadline = started + args.seconds
+        await asyncio.gather(
+            *(
+                operator(telegram, 1000 + number, spec, deadline, args.think, latencies, timeouts)
+                for number in range(args.operators)
+            )
+        )
+        elapsed = time.perf_counter() - started
+    except asyncio.TimeoutError:
+        raise RuntimeError(f"Bot did not start polling, see {log_path}:\n{log_path.read_text()[-2000:]}")
+    finally:
+        if bot.returncode is None:
+            bot.send_signal(signal.SIGINT)
+            await bot.wait()
+        await runner.cleanup()
+
+    replies = sum(len(values) for values in latencies.values())
+    return {
+        "operators": args.operators,
+        "seconds": round(elapsed, 1),
+        "dataset": spec.__dict__,
+        "updates_per_s": round(replies / elapsed, 1),
+        "timeouts": dict(timeouts),
+        "api_calls": len(telegram.calls),
+        "stale_replies": telegram.stale_replies,
+        "overall": _summary([value for values in latencies.values() for value in values]),
+        "actions": {name: _summary(values) for name, values in sorted(latencies.items())},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operators", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--think", type=float, default=0, help="средняя пауза оператора между действиями, с")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--out", type=Path, default=Path("load_results.json"))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = asyncio.run(run(args, Path(tmp)))
+    args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+
+    overall = report["overall"]
+    print(
+        f"{args.operators} operators, {report['seconds']} s: {report['updates_per_s']} updates/s, "
+        f"p50 {overall['p50_ms']} ms, p95 {overall['p95_ms']} ms, p99 {overall['p99_ms']} ms"
+    )
+    for name, values in report["actions"].items():
+        print(
+            f"  {name:>15}: {values['count']:6d} replies, p50 {values['p50_ms']:8.2f}  "
+            f"p95 {values['p95_ms']:8.2f}  p99 {values['p99_ms']:8.2f} ms"
+        )
+    if report["timeouts"]:
+        print(f"No reply within {REPLY_TIMEOUT} s: {report['timeouts']}")
+    print(f"Saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Пропускная способность записи при нескольких операторах одновременно:
+профиль "development" (настройки драйвера) против "production" (WAL и прагмы),
+и оба — с очередью записи (writer.WriteQueue), которая коммитит пачками.
+
+    python -m bench.write_throughput [--writers 8] [--seconds 5]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from itertools import product
+from pathlib import Path
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:bench")
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker  # noqa: E402
+
+from db import Base, make_engine  # noqa: E402
+from models import Client, ClientStatus, Interaction, InteractionResult  # noqa: E402
+from writer import WriteQueue  # noqa: E402
+
+
+async def prepare(engine: AsyncEngine, clients: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        session.add_all(Client(name=f"Клиент {i}", phone=f"+7700{i:07d}") for i in range(clients))
+        await session.commit()
+
+
+async def writer(queue: WriteQueue, worker: int, clients: int, deadline: float, stats: dict[str, int]) -> None:
+    # Как save_comment: одна запись истории на операцию
+    step = 0
+    while time.perf_counter() < deadline:
+        step += 1
+        client_id = (worker * 7919 + step) % clients + 1
+
+        async def add_comment(session: AsyncSession) -> None:
+            session.add(
+                Interaction(
+                    client_id=client_id,
+                    result=InteractionResult.CALL,
+                    status_after=ClientStatus.THINKING,
+                    comment="bench",
+                )
+            )
+
+        try:
+            await queue.submit(add_comment)
+            stats["ok"] += 1
+        except OperationalError:
+            stats["locked"] += 1
+
+
+async def run_profile(
+    profile: str, queued: bool, writers: int, seconds: float, clients: int
+) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}", profile)
+        await prepare(engine, clients)
+        # Без start() очередь выполняет каждую операцию своей транзакцией — как раньше обработчики
+        queue = WriteQueue(async_sessionmaker(engine, expire_on_commit=False))
+        if queued:
+            queue.start()
+        stats = {"ok": 0, "locked": 0}
+        started = time.perf_counter()
+        deadline = started + seconds
+        await asyncio.gather(*(writer(queue, worker, clients, deadline, stats) for worker in range(writers)))
+        elapsed = time.perf_counter() - started
+        await queue.stop()
+        await engine.dispose()
+    return {"writes_per_s": stats["ok"] / elapsed, "locked_errors": stats["locked"]}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--clients", type=int, default=1000)
+    args = parser.parse_args()
+    for profile, queued in product(("development", "production"), (False, True)):
+        result = await run_profile(profile, queued, args.writers, args.seconds, args.clients)
+        label = f"{profile}{' + queue' if queued else ''}"
+        print(
+            f"{label:>18}: {result['writes_per_s']:8.1f} writes/s, "
+            f"{result['locked_errors']} 'database is locked'"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
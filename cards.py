@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from config import MESSAGE_LIMIT
+from models import Client
+
+
+def client_cards_query(client_ids: Iterable[int]) -> Select:
+    """
+    Клиенты вместе с компанией одним запросом. Последнее общение хранится
+    в самих clients (last_interaction_*), interactions для карточки не читаются.
+    """
+    return select(Client).options(joinedload(Client.company)).where(Client.id.in_(list(client_ids)))
+
+
+async def load_client_cards(session: AsyncSession, client_ids: Iterable[int]) -> dict[int, Client]:
+    result = await session.execute(client_cards_query(client_ids))
+    return {client.id: client for client in result.scalars().unique().all()}
+
+
+async def load_client_card(session: AsyncSession, client_id: int) -> Client | None:
+    return (await load_client_cards(session, [client_id])).get(client_id)
+
+
+def telegram_length(text: str) -> int:
+    """Длина так, как её считает Telegram, — в единицах UTF-16: эмодзи занимают две."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _cut(block: str, limit: int) -> Iterator[str]:
+    start, size = 0, 0
+    for index, char in enumerate(block):
+        width = 2 if ord(char) > 0xFFFF else 1
+        if size + width > limit:
+            yield block[start:index]
+            start, size = index, 0
+        size += width
+    yield block[start:]
+
+
+def split_message(blocks: list[str], limit: int = MESSAGE_LIMIT) -> list[str]:
+    """Склеивает блоки через пустую строку в сообщения не длиннее limit, длинные блоки режет."""
+    parts: list[str] = []
+    for block in filter(None, blocks):
+        parts.extend(_cut(block, limit) if telegram_length(block) > limit else [block])
+    chunks: list[str] = []
+    sizes: list[int] = []
+    for part in parts:
+        size = telegram_length(part)
+        if chunks and sizes[-1] + 2 + size <= limit:
+            chunks[-1] += "\n\n" + part
+            sizes[-1] += 2 + size
+        else:
+            chunks.append(part)
+            sizes.append(size)
+    return chunks
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from enum import Enum
+
+from sqlalchemy import Select, select
+
+from models import Client, Company, CompanySource, CompanyStatus, PriorityLevel, Suggestion, SuggestionType
+
+# Индексы (поле, created_at, id) под эти поля объявлены в models.Company и models.Client
+_ENUM_FIELDS: dict[str, tuple[str, type[Enum]]] = {
+    "status": ("s", CompanyStatus),
+    "priority": ("p", PriorityLevel),
+    "source": ("o", CompanySource),
+}
+_SUGGESTION_FIELDS: dict[str, tuple[str, SuggestionType]] = {
+    "city_id": ("c", SuggestionType.CITY),
+    "niche_id": ("n", SuggestionType.NICHE),
+}
+# Поле фильтра -> колонка компании
+_FIELD_COLUMNS = {
+    "status": "status",
+    "priority": "priority",
+    "source": "source",
+    "city_id": "city",
+    "niche_id": "niche",
+}
+_LETTERS = {letter: name for name, (letter, _) in {**_ENUM_FIELDS, **_SUGGESTION_FIELDS}.items()}
+_PART = re.compile(r"([a-z])(\d+)")
+
+
+@dataclass(frozen=True)
+class CompanyFilter:
+    """
+    Набор условий на компании. В callback_data упаковывается как "f" и пары
+    буква+число: перечисления — номером значения, город и ниша — id подсказки,
+    например "fs0p2c14" (не звонили, высокий приоритет, город из подсказки 14).
+    """
+
+    status: CompanyStatus | None = None
+    priority: PriorityLevel | None = None
+    source: CompanySource | None = None
+    city_id: int | None = None
+    niche_id: int | None = None
+
+    def pack(self) -> str:
+        parts = ["f"]
+        for name, (letter, enum_type) in _ENUM_FIELDS.items():
+            value = getattr(self, name)
+            if value is not None:
+                parts.append(f"{letter}{list(enum_type).index(value)}")
+        for name, (letter, _) in _SUGGESTION_FIELDS.items():
+            value = getattr(self, name)
+            if value is not None:
+                parts.append(f"{letter}{value}")
+        return "".join(parts)
+
+    @classmethod
+    def unpack(cls, value: str) -> CompanyFilter:
+        # Старые кнопки из уже отправленных сообщений: "all" и "status-<значение>"
+        if value == "all":
+            return cls()
+        if value.startswith("status-"):
+            return cls(status=CompanyStatus(value.split("-", 1)[1]))
+        if not value.startswith("f"):
+            raise ValueError(f"Unknown filter: {value}")
+        values = {}
+        for letter, number in _PART.findall(value[1:]):
+            name = _LETTERS[letter]
+            if name in _ENUM_FIELDS:
+                values[name] = list(_ENUM_FIELDS[name][1])[int(number)]
+            else:
+                values[name] = int(number)
+        return cls(**values)
+
+    @property
+    def is_empty(self) -> bool:
+        return self == CompanyFilter()
+
+
+def _suggestion_value(suggestion_id: int, suggestion_type: SuggestionType):
+    # Некоррелированный подзапрос вычисляется один раз, индекс по городу/нише остаётся в силе
+    return (
+        select(Suggestion.value)
+        .where(Suggestion.id == suggestion_id, Suggestion.type == suggestion_type)
+        .scalar_subquery()
+    )
+
+
+def _column(model: type[Company] | type[Client], name: str):
+    # У клиентов поля компании скопированы в company_<поле> (см. models.COMPANY_FILTER_FIELDS)
+    field = _FIELD_COLUMNS[name]
+    return getattr(model, field if model is Company else f"company_{field}")
+
+
+def apply_company_filter(stmt: Select, spec: CompanyFilter, model: type[Company] | type[Client] = Company) -> Select:
+    for name in _ENUM_FIELDS:
+        value = getattr(spec, name)
+        if value is not None:
+            stmt = stmt.where(_column(model, name) == value)
+    for name, (_, suggestion_type) in _SUGGESTION_FIELDS.items():
+        value = getattr(spec, name)
+        if value is not None:
+            stmt = stmt.where(_column(model, name) == _suggestion_value(value, suggestion_type))
+    return stmt
+
+
+def companies_query(spec: CompanyFilter) -> Select:
+    return apply_company_filter(select(Company), spec)
+
+
+def clients_query(spec: CompanyFilter) -> Select:
+    """Клиенты, чья компания подходит под фильтр; пустой фильтр — все клиенты."""
+    return apply_company_filter(select(Client), spec, Client)
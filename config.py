@@ -13,5 +13,65 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 
 if not TELEGRAM_BOT_TOKEN:
     raise RuntimeError("TELEGRAM_BOT_TOKEN is not set. Define it in environment or .env file.")
+# Свой сервер Bot API (локальный telegram-bot-api или bench.fake_telegram); по умолчанию api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
 
-PAGE_SIZE = 5
\ No newline at end of file
+# Профиль движка БД (db.py): "production" — WAL и настройки ниже, "development" (или любой другой) — как есть у драйвера
+DB_PROFILE = os.getenv("DB_PROFILE", "production")
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": -64 * 1024,  # отрицательное значение — в КиБ, т.е. 64 МиБ
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = 30 * 60
+DB_STATEMENT_CACHE_SIZE = 500
+# Очередь записи (writer.py): сколько ждать попутчиков для общей транзакции и сколько брать максимум
+WRITE_BATCH_LINGER = 0.005
+WRITE_BATCH_MAX = 100
+# Запросы дольше этого (мс) пишутся в лог вместе с типами параметров (instrumentation.py)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Сколько самых затратных запросов показывать в /dbstats
+DBSTATS_TOP = 10
+# Метрики обработчиков в формате Prometheus (metrics.py); без порта не собираются
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0")) or None
+
+# Кому доступны служебные команды (/dbstats, /rebuild_stats); пустой список — никому
+ADMIN_IDS = {int(value) for value in os.getenv("ADMIN_IDS", "").split(",") if value.strip()}
+
+# Часовой пояс операторов: границы "сегодня", время звонков в карточках
+TIMEZONE = os.getenv("TIMEZONE", "UTC")
+
+PAGE_SIZE = 5
+TASKS_PAGE_SIZE = 10
+HISTORY_PAGE_SIZE = 10
+# Предел длины текста одного сообщения в Telegram
+MESSAGE_LIMIT = 4096
+# Сколько самых частых городов и ниш показывать в меню фильтров
+FACET_TOP_VALUES = 6
+SEARCH_RESULT_LIMIT = 500
+# Меньше цифр подходит почти к каждому номеру: поиск по суффиксам такие запросы не выполняет
+PHONE_SEARCH_MIN_DIGITS = 3
+SEARCH_PAGE_SIZE = 10
+SEARCH_SESSION_TTL = 30 * 60
+SEARCH_SESSIONS_MAX = 1000
+
+INLINE_PAGE_SIZE = 20
+INLINE_DEBOUNCE = 0.3
+INLINE_CACHE_TTL = 60
+INLINE_CACHE_SIZE = 1000
+INLINE_CACHE_TIME = 30
+
+# Период фонового пересчёта дневных агрегатов для /report, секунды
+ROLLUP_INTERVAL = 300
+
+# Куда слать напоминания, если неизвестно, какой оператор назначил контакт
+REMINDER_CHAT_IDS = {
+    int(value) for value in os.getenv("REMINDER_CHAT_IDS", "").split(",") if value.strip()
+} or ADMIN_IDS
+REMINDER_LOOKAHEAD_HOURS = 24
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import Connection, delete, event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from db import upsert_increment
+from models import Client, Company, Interaction, StatCounter
+from timeutils import to_local
+from writer import WriteQueue, write_queue
+
+CLIENTS = "clients"  # ключ "статус:интерес"
+COMPANIES = "companies"  # ключ "статус:приоритет"
+INTERACTIONS_PER_DAY = "interactions_per_day"  # ключ "ГГГГ-ММ-ДД" по времени оператора
+
+
+def client_key(status, interest) -> str:
+    return f"{status.value}:{interest.value}"
+
+
+def company_key(status, priority) -> str:
+    return f"{status.value}:{priority.value}"
+
+
+def day_key(moment: datetime) -> str:
+    return to_local(moment).date().isoformat()
+
+
+def _counter_key(obj: object, *, old: bool = False) -> tuple[str, str] | None:
+    def value(attr: str):
+        if old:
+            history = inspect(obj).attrs[attr].history
+            if history.deleted:
+                return history.deleted[0]
+        return getattr(obj, attr)
+
+    if isinstance(obj, Client):
+        return CLIENTS, client_key(value("status"), value("interest"))
+    if isinstance(obj, Company):
+        return COMPANIES, company_key(value("status"), value("priority"))
+    if isinstance(obj, Interaction):
+        return INTERACTIONS_PER_DAY, day_key(value("created_at"))
+    return None
+
+
+def collect_deltas(session: Session) -> Counter[tuple[str, str]]:
+    deltas: Counter[tuple[str, str]] = Counter()
+    for obj in session.new:
+        key = _counter_key(obj)
+        if key:
+            deltas[key] += 1
+    for obj in session.deleted:
+        key = _counter_key(obj, old=True)
+        if key:
+            deltas[key] -= 1
+    for obj in session.dirty:
+        new_key = _counter_key(obj)
+        old_key = _counter_key(obj, old=True)
+        if new_key != old_key:
+            deltas[new_key] += 1
+            deltas[old_key] -= 1
+    return deltas
+
+
+def apply_deltas(connection: Connection, deltas: Counter[tuple[str, str]]) -> None:
+    rows = [
+        {"metric": metric, "key": key, "value": delta}
+        for (metric, key), delta in deltas.items()
+        if delta
+    ]
+    upsert_increment(connection, StatCounter, "value", rows)
+
+
+@event.listens_for(Session, "after_flush")
+def _update_counters(session: Session, flush_context) -> None:
+    # Тот же flush и та же транзакция: счётчики не расходятся с данными при откате
+    apply_deltas(session.connection(), collect_deltas(session))
+
+
+def rebuild_counters(connection: Connection) -> None:
+    """Пересчитывает все счётчики с нуля по исходным таблицам."""
+    counts: Counter[tuple[str, str]] = Counter()
+    for status, interest, count in connection.execute(
+        select(Client.status, Client.interest, func.count()).group_by(Client.status, Client.interest)
+    ):
+        counts[CLIENTS, client_key(status, interest)] += count
+    for status, priority, count in connection.execute(
+        select(Company.status, Company.priority, func.count()).group_by(Company.status, Company.priority)
+    ):
+        counts[COMPANIES, company_key(status, priority)] += count
+    # Группируем по часам UTC и раскладываем часы по местным дням уже в Python
+    if connection.dialect.name == "postgresql":
+        hour = func.date_trunc("hour", Interaction.created_at)
+    else:
+        hour = func.strftime("%Y-%m-%d %H:00:00", Interaction.created_at)
+    for value, count in connection.execute(select(hour, func.count()).group_by(hour)):
+        moment = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+        counts[INTERACTIONS_PER_DAY, day_key(moment)] += count
+    connection.execute(delete(StatCounter))
+    apply_deltas(connection, counts)
+
+
+async def _rebuild_op(session: AsyncSession) -> None:
+    await session.run_sync(lambda sync_session: rebuild_counters(sync_session.connection()))
+
+
+async def rebuild_all_counters(queue: WriteQueue = write_queue) -> None:
+    """Пересчёт через очередь записи, чтобы не спорить за блокировку с обработчиками."""
+    await queue.submit(_rebuild_op)
@@ -1,12 +1,23 @@
 from __future__ import annotations
 
-from typing import AsyncIterator
+from typing import Any, AsyncIterator
 from contextlib import asynccontextmanager
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import Connection, event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
-from config import DATABASE_URL
+from config import (
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_PROFILE,
+    DB_STATEMENT_CACHE_SIZE,
+    SQLITE_PRAGMAS,
+)
 
 
 class Base(DeclarativeBase):
@@ -14,12 +25,57 @@ class Base(DeclarativeBase):
     pass
 
 
+def engine_options(url: str, profile: str = DB_PROFILE) -> dict[str, Any]:
+    if profile != "production" or not url.startswith("postgresql"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_pre_ping": True,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "connect_args": {"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+def _disable_driver_transactions(dbapi_connection, connection_record) -> None:
+    dbapi_connection.isolation_level = None
+
+
+def _emit_begin(connection: Connection) -> None:
+    connection.exec_driver_sql("BEGIN")
+
+
+def make_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE) -> AsyncEngine:
+    """
+    В профиле "production" SQLite получает WAL и прагмы из SQLITE_PRAGMAS на каждом
+    новом соединении (меньше "database is locked", коммит без fsync журнала),
+    а Postgres — пул соединений с pre-ping и кэшем подготовленных запросов.
+    """
+    new_engine = create_async_engine(
+        url,
+        echo=False,      # можно включить True для отладки SQL
+        future=True,
+        **engine_options(url, profile),
+    )
+    if new_engine.dialect.name == "sqlite":
+        # Драйвер sqlite3 сам решает, когда начинать транзакцию, и ломает SAVEPOINT
+        # (очередь записи держит каждую операцию в своём); BEGIN выдаём сами
+        event.listen(new_engine.sync_engine, "connect", _disable_driver_transactions)
+        event.listen(new_engine.sync_engine, "begin", _emit_begin)
+        if profile == "production":
+            event.listen(new_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return new_engine
+
+
 # Движок для async SQLite (или другой БД, если поменяешь DATABASE_URL)
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,      # можно включить True для отладки SQL
-    future=True,
-)
+engine = make_engine()
 
 # Фабрика асинхронных сессий
 async_session_maker = async_sessionmaker(
@@ -38,3 +94,17 @@ async def get_session() -> AsyncIterator[AsyncSession]:
     """
     async with async_session_maker() as session:
         yield session
+
+
+def upsert_increment(connection: Connection, model: type[Base], column: str, rows: list[dict]) -> None:
+    """INSERT ... ON CONFLICT (первичный ключ) DO UPDATE column = column + excluded.column."""
+    if not rows:
+        return
+    insert = pg_insert if connection.dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(model)
+    target = getattr(model, column)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(model.__table__.primary_key.columns),
+        set_={column: target + getattr(stmt.excluded, column)},
+    )
+    connection.execute(stmt, rows)
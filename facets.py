@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field, fields
+from typing import Sequence
+
+from sqlalchemy import Row, and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from company_filters import CompanyFilter
+from config import FACET_TOP_VALUES
+from list_counts import tables_version
+from models import Client, Company, CompanySource, CompanyStatus, PriorityLevel, Suggestion, SuggestionType
+
+
+@dataclass
+class Facets:
+    total: int = 0
+    statuses: Counter[CompanyStatus] = field(default_factory=Counter)
+    priorities: Counter[PriorityLevel] = field(default_factory=Counter)
+    sources: Counter[CompanySource] = field(default_factory=Counter)
+    # (id подсказки, значение) -> количество; без подсказки значение в фильтр не упаковать
+    cities: Counter[tuple[int, str]] = field(default_factory=Counter)
+    niches: Counter[tuple[int, str]] = field(default_factory=Counter)
+
+    def top_cities(self) -> list[tuple[tuple[int, str], int]]:
+        return self.cities.most_common(FACET_TOP_VALUES)
+
+    def top_niches(self) -> list[tuple[tuple[int, str], int]]:
+        return self.niches.most_common(FACET_TOP_VALUES)
+
+
+_FIELDS = tuple(spec_field.name for spec_field in fields(CompanyFilter))
+# Область -> (версия таблиц, строки GROUP BY по всем полям фильтра)
+_cache: dict[str, tuple[tuple[int, ...], Sequence[Row]]] = {}
+
+
+def _tables(scope: str) -> tuple[str, ...]:
+    if scope == "clients":
+        return ("clients", "companies", "suggestions")
+    return ("companies", "suggestions")
+
+
+async def _groups(session: AsyncSession, scope: str) -> Sequence[Row]:
+    version = tables_version(_tables(scope))
+    cached = _cache.get(scope)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    city = aliased(Suggestion)
+    niche = aliased(Suggestion)
+    # Имена колонок совпадают с полями CompanyFilter
+    columns = (
+        Company.status,
+        Company.priority,
+        Company.source,
+        city.id.label("city_id"),
+        Company.city,
+        niche.id.label("niche_id"),
+        Company.niche,
+    )
+    stmt = select(*columns, func.count().label("size"))
+    if scope == "clients":
+        stmt = stmt.select_from(Client).outerjoin(Client.company)
+    else:
+        stmt = stmt.select_from(Company)
+    stmt = (
+        stmt.outerjoin(city, and_(city.type == SuggestionType.CITY, city.value == Company.city))
+        .outerjoin(niche, and_(niche.type == SuggestionType.NICHE, niche.value == Company.niche))
+        .group_by(*columns)
+    )
+    groups = (await session.execute(stmt)).all()
+    _cache[scope] = (version, groups)
+    return groups
+
+
+async def collect_facets(session: AsyncSession, scope: str, spec: CompanyFilter = CompanyFilter()) -> Facets:
+    """
+    Количество компаний (или клиентов по их компаниям) под фильтром spec в
+    разрезе статуса, приоритета, источника, города и ниши. Значения поля
+    считаются по остальным условиям фильтра: выбор в поле заменяет текущее
+    условие на него. Один GROUP BY на область, пересчёт только после записи в
+    участвующие таблицы; фильтр накладывается на его строки в памяти.
+    """
+    chosen = {name: getattr(spec, name) for name in _FIELDS if getattr(spec, name) is not None}
+    facets = Facets()
+    for group in await _groups(session, scope):
+        missed = [name for name, value in chosen.items() if getattr(group, name) != value]
+        if len(missed) > 1:
+            continue
+        if not missed:
+            facets.total += group.size
+        # Подходит под весь фильтр — в счётчики всех полей, мимо одного условия — только в его поле
+        counted = missed or _FIELDS
+        if group.status is not None and "status" in counted:
+            facets.statuses[group.status] += group.size
+        if group.priority is not None and "priority" in counted:
+            facets.priorities[group.priority] += group.size
+        if group.source is not None and "source" in counted:
+            facets.sources[group.source] += group.size
+        if group.city_id is not None and "city_id" in counted:
+            facets.cities[group.city_id, group.city] += group.size
+        if group.niche_id is not None and "niche_id" in counted:
+            facets.niches[group.niche_id, group.niche] += group.size
+    return facets
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import re
+from typing import Iterable
+
+from sqlalchemy import (
+    Connection,
+    Float,
+    Integer,
+    Select,
+    String,
+    TextualSelect,
+    column,
+    func,
+    literal,
+    select,
+    text,
+    union_all,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Client, Company, Interaction
+
+# Что проиндексировано: имя клиента; название, контактное лицо и комментарий компании;
+# комментарии к взаимодействиям (находят клиента, к которому относятся).
+KINDS = ("client", "company", "interaction")
+
+FTS_TABLE = "search_fts"
+
+
+def _fold(column: str) -> str:
+    # unicode61 снимает диакритику только у латиницы, поэтому "ё" приводим к "е" сами
+    return f"replace(replace(coalesce({column}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+
+# rowid в FTS-таблице однозначно выводится из записи (клиент id*3, компания id*3+1,
+# взаимодействие id*3+2), поэтому триггеры обновляют индекс без таблиц соответствия
+_SQLITE_DDL = (
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        kind UNINDEXED,
+        ref_id UNINDEXED,
+        title,
+        body,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS clients_fts_insert AFTER INSERT ON clients BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, kind, ref_id, title, body)
+        VALUES (new.id * 3, 'client', new.id, {_fold('new.name')}, '');
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS clients_fts_update AFTER UPDATE OF name ON clients BEGIN
+        UPDATE {FTS_TABLE} SET title = {_fold('new.name')} WHERE rowid = new.id * 3;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS clients_fts_delete AFTER DELETE ON clients BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 3;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS companies_fts_insert AFTER INSERT ON companies BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, kind, ref_id, title, body)
+        VALUES (
+            new.id * 3 + 1, 'company', new.id, {_fold('new.name')},
+            {_fold('new.contact_person')} || ' ' || {_fold('new.note')}
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS companies_fts_update
+    AFTER UPDATE OF name, contact_person, note ON companies BEGIN
+        UPDATE {FTS_TABLE}
+        SET title = {_fold('new.name')},
+            body = {_fold('new.contact_person')} || ' ' || {_fold('new.note')}
+        WHERE rowid = new.id * 3 + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS companies_fts_delete AFTER DELETE ON companies BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 3 + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS interactions_fts_insert AFTER INSERT ON interactions
+    WHEN new.comment IS NOT NULL BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, kind, ref_id, title, body)
+        VALUES (new.id * 3 + 2, 'interaction', new.client_id, '', {_fold('new.comment')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS interactions_fts_update AFTER UPDATE OF comment ON interactions BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 3 + 2;
+        INSERT INTO {FTS_TABLE}(rowid, kind, ref_id, title, body)
+        SELECT new.id * 3 + 2, 'interaction', new.client_id, '', {_fold('new.comment')}
+        WHERE new.comment IS NOT NULL;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS interactions_fts_delete AFTER DELETE ON interactions BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 3 + 2;
+    END
+    """,
+)
+
+_SQLITE_REBUILD = (
+    f"DELETE FROM {FTS_TABLE}",
+    f"""
+    INSERT INTO {FTS_TABLE}(rowid, kind, ref_id, title, body)
+    SELECT id * 3, 'client', id, {_fold('name')}, '' FROM clients
+    """,
+    f"""
+    INSERT INTO {FTS_TABLE}(rowid, kind, ref_id, title, body)
+    SELECT id * 3 + 1, 'company', id, {_fold('name')}, {_fold('contact_person')} || ' ' || {_fold('note')}
+    FROM companies
+    """,
+    f"""
+    INSERT INTO {FTS_TABLE}(rowid, kind, ref_id, title, body)
+    SELECT id * 3 + 2, 'interaction', client_id, '', {_fold('comment')} FROM interactions
+    WHERE comment IS NOT NULL
+    """,
+)
+
+# Для Postgres вместо FTS5 — триграммные GIN-индексы, которые обслуживают ILIKE '%...%'
+_POSTGRES_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_clients_name_trgm ON clients USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_companies_name_trgm ON companies USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_companies_contact_person_trgm "
+    "ON companies USING gin (contact_person gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_companies_note_trgm ON companies USING gin (note gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_interactions_comment_trgm "
+    "ON interactions USING gin (comment gin_trgm_ops)",
+)
+
+
+def setup_fulltext(connection: Connection) -> None:
+    """Создаёт поисковый индекс и поддерживающие его триггеры (идемпотентно)."""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE},
+        ).first()
+        for statement in _SQLITE_DDL[1 if exists else 0 :]:
+            connection.execute(text(statement))
+        if not exists:
+            rebuild_fulltext(connection)
+    elif dialect == "postgresql":
+        for statement in _POSTGRES_DDL:
+            connection.execute(text(statement))
+
+
+def rebuild_fulltext(connection: Connection) -> None:
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in _SQLITE_REBUILD:
+        connection.execute(text(statement))
+
+
+def build_match_query(query: str) -> str | None:
+    """Каждое слово запроса превращается в префиксный терм: "рома" найдёт "Ромашка"."""
+    terms = re.findall(r"\w+", query.casefold().replace("ё", "е"))
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def fulltext_hits(
+    dialect_name: str,
+    query: str,
+    kinds: Iterable[str] = KINDS,
+    limit: int = 50,
+) -> Select | TextualSelect | None:
+    """
+    Запрос с колонками (entity, ref_id, score): по строке на найденного клиента
+    или компанию, чем меньше score — тем релевантнее. Пригоден как подзапрос/CTE.
+    """
+    kinds = tuple(kind for kind in kinds if kind in KINDS)
+    if not kinds:
+        return None
+    if dialect_name == "postgresql":
+        return _trigram_hits(query, kinds, limit)
+    match = build_match_query(query)
+    if match is None:
+        return None
+    # Окно кандидатов с запасом: несколько комментариев одного клиента схлопываются в одну строку
+    return text(
+        f"""
+        SELECT entity, ref_id, min(score) AS score FROM (
+            SELECT CASE kind WHEN 'interaction' THEN 'client' ELSE kind END AS entity,
+                   ref_id,
+                   bm25({FTS_TABLE}, 0.0, 0.0, 10.0, 1.0) AS score
+            FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH :match AND kind IN ({", ".join(f"'{kind}'" for kind in kinds)})
+            ORDER BY score
+            LIMIT :window
+        )
+        GROUP BY entity, ref_id
+        ORDER BY min(score)
+        LIMIT :limit
+        """
+    ).bindparams(match=match, window=limit * 4, limit=limit).columns(
+        column("entity", String), column("ref_id", Integer), column("score", Float)
+    )
+
+
+async def fulltext_search(
+    session: AsyncSession,
+    query: str,
+    kinds: Iterable[str] = KINDS,
+    limit: int = 50,
+) -> list[tuple[str, int]]:
+    """
+    Возвращает [(сущность, id), ...] по убыванию релевантности, где сущность —
+    "client" или "company". Совпадения в комментариях приводят к клиенту.
+    """
+    stmt = fulltext_hits(session.bind.dialect.name, query, kinds, limit)
+    if stmt is None:
+        return []
+    result = await session.execute(stmt)
+    return [(entity, int(ref_id)) for entity, ref_id, _ in result.all()]
+
+
+def _trigram_hits(query: str, kinds: tuple[str, ...], limit: int) -> Select | None:
+    query = query.strip()
+    if not query:
+        return None
+    # % и _ из ввода оператора — обычные символы, а не шаблон ILIKE
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    pattern = f"%{escaped}%"
+    parts = []
+    if "client" in kinds:
+        parts.append(
+            select(
+                literal("client").label("entity"),
+                Client.id.label("ref_id"),
+                func.similarity(Client.name, query).label("similarity"),
+            ).where(Client.name.ilike(pattern, escape="\\"))
+        )
+    if "company" in kinds:
+        for field in (Company.name, Company.contact_person, Company.note):
+            parts.append(
+                select(
+                    literal("company").label("entity"),
+                    Company.id.label("ref_id"),
+                    func.similarity(field, query).label("similarity"),
+                ).where(field.ilike(pattern, escape="\\"))
+            )
+    if "interaction" in kinds:
+        parts.append(
+            select(
+                literal("client").label("entity"),
+                Interaction.client_id.label("ref_id"),
+                func.similarity(Interaction.comment, query).label("similarity"),
+            ).where(Interaction.comment.ilike(pattern, escape="\\"))
+        )
+    matches = union_all(*parts).subquery()
+    return (
+        select(matches.c.entity, matches.c.ref_id, (-func.max(matches.c.similarity)).label("score"))
+        .group_by(matches.c.entity, matches.c.ref_id)
+        .order_by(func.max(matches.c.similarity).desc())
+        .limit(limit)
+    )
@@ -5,6 +5,8 @@ from .clients import router as clients_router
 from .companies import router as companies_router
 from .search import router as search_router
 from .stats import router as stats_router
+from .inline import router as inline_router
+from .admin import router as admin_router
 
 router = Router()
 router.include_router(start_router)
@@ -12,3 +14,5 @@ router.include_router(clients_router)
 router.include_router(companies_router)
 router.include_router(search_router)
 router.include_router(stats_router)
+router.include_router(inline_router)
+router.include_router(admin_router)
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from html import escape
+
+from aiogram import Router
+from aiogram.filters import BaseFilter, Command
+from aiogram.types import Message
+
+from cards import split_message
+from config import ADMIN_IDS, DBSTATS_TOP
+from counters import rebuild_all_counters
+from instrumentation import statement_stats, top_statements
+
+router = Router()
+
+
+class AdminFilter(BaseFilter):
+    """Служебные команды только для ADMIN_IDS; если список не задан, они закрыты для всех."""
+
+    async def __call__(self, message: Message) -> bool:
+        return message.from_user is not None and message.from_user.id in ADMIN_IDS
+
+
+router.message.filter(AdminFilter())
+
+
+@router.message(Command("rebuild_stats"))
+async def rebuild_stats(message: Message) -> None:
+    await rebuild_all_counters()
+    await message.answer("Счётчики статистики пересчитаны")
+
+
+@router.message(Command("dbstats"))
+async def dbstats(message: Message) -> None:
+    """Самые затратные запросы с запуска бота; "/dbstats reset" обнуляет статистику."""
+    if message.text and message.text.split()[-1] == "reset":
+        statement_stats.clear()
+        await message.answer("Статистика запросов сброшена")
+        return
+    top = top_statements(DBSTATS_TOP)
+    if not top:
+        await message.answer("Запросов пока не было")
+        return
+    blocks = []
+    for sql, handler, stats in top:
+        blocks.append(
+            f"<b>{stats.total_ms:.1f} мс</b> за {stats.count} раз, "
+            f"среднее {stats.total_ms / stats.count:.1f}, p95 ≤ {stats.quantile_ms(0.95):.0f}, "
+            f"макс {stats.max_ms:.1f} — {escape(handler)}\n<code>{escape(sql[:300])}</code>"
+        )
+    # Блоки короче лимита, поэтому режутся только между ними и HTML-теги остаются целыми
+    for chunk in split_message(blocks):
+        await message.answer(chunk)
@@ -8,11 +8,13 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from config import PAGE_SIZE
+from cards import load_client_card, split_message
+from company_filters import CompanyFilter, clients_query
+from config import HISTORY_PAGE_SIZE, PAGE_SIZE
 from db import get_session
 from keyboards import (
     call_result_keyboard,
@@ -22,11 +24,18 @@ from keyboards import (
     next_contact_keyboard,
     source_keyboard,
 )
-from models import Client, ClientStatus, Company, Interaction, InteractionResult, InterestLevel, CompanyStatus
-from handlers.filters import build_status_filter_keyboard, get_existing_company_statuses
+from models import Client, ClientStatus, Interaction, InteractionResult, InterestLevel, normalize_phone
+from handlers.filters import build_facet_filter_keyboard, filter_button, get_facets
+from list_counts import cached_count
+from pagination import FIRST_PAGE, fetch_keyset_page
+from reminders import reminder_scheduler
+from timeutils import to_local, to_utc
+from writer import write_queue
 
 router = Router()
 
+FILTER_PROMPT = "Отметьте условия компании клиента: статус, приоритет, источник, город или ниша"
+
 
 class AddClientStates(StatesGroup):
     phone = State()
@@ -37,15 +46,6 @@ class AddClientStates(StatesGroup):
     comment = State()
 
 
-def normalize_phone(value: str) -> str:
-    digits = "".join(ch for ch in value if ch.isdigit() or ch == "+")
-    if digits.startswith("8"):
-        digits = "+7" + digits[1:]
-    if not digits.startswith("+"):
-        digits = "+" + digits
-    return digits
-
-
 def build_whatsapp_url(phone: str | None) -> str | None:
     if not phone:
         return None
@@ -55,7 +55,7 @@ def build_whatsapp_url(phone: str | None) -> str | None:
     return f"https://wa.me/{digits}"
 
 
-def format_client(client: Client, last_interaction: Interaction | None = None) -> str:
+def format_client(client: Client) -> str:
     interest_map = {
         InterestLevel.COLD: "🔵 Холодный",
         InterestLevel.WARM: "🟡 Тёплый",
@@ -79,26 +79,15 @@ def format_client(client: Client, last_interaction: Interaction | None = None) -
     if client.company:
         lines.append(f"Компания: {client.company.name}")
     if client.next_contact_at:
-        lines.append(f"Следующий контакт: {client.next_contact_at:%d.%m.%Y %H:%M}")
-    if last_interaction:
-        comment = last_interaction.comment or "без комментария"
+        lines.append(f"Следующий контакт: {to_local(client.next_contact_at):%d.%m.%Y %H:%M}")
+    if client.last_interaction_at:
+        comment = client.last_comment_preview or "без комментария"
         lines.append(
-            f"Последнее общение: {last_interaction.created_at:%d.%m %H:%M} — {comment}"
+            f"Последнее общение: {to_local(client.last_interaction_at):%d.%m %H:%M} — {comment}"
         )
     return "\n".join(lines)
 
 
-async def get_last_interaction(session: AsyncSession, client_id: int) -> Interaction | None:
-    stmt = (
-        select(Interaction)
-        .where(Interaction.client_id == client_id)
-        .order_by(Interaction.created_at.desc())
-        .limit(1)
-    )
-    result = await session.execute(stmt)
-    return result.scalar_one_or_none()
-
-
 @router.message(F.text == "➕ Добавить клиента")
 @router.message(Command("add_client"))
 async def start_add_client(message: Message, state: FSMContext) -> None:
@@ -148,13 +137,14 @@ async def add_client_interest(callback: CallbackQuery, state: FSMContext) -> Non
 
 
 def resolve_next_contact(choice: str) -> datetime | None:
-    now = datetime.utcnow()
+    # Полдень по времени оператора, сохраняется в UTC
+    now = to_local(datetime.utcnow())
     if choice == "same":
-        return now.replace(hour=12, minute=0, second=0, microsecond=0)
+        return to_utc(now.replace(hour=12, minute=0, second=0, microsecond=0))
     if choice == "tomorrow":
-        return (now + timedelta(days=1)).replace(hour=12, minute=0, second=0, microsecond=0)
+        return to_utc((now + timedelta(days=1)).replace(hour=12, minute=0, second=0, microsecond=0))
     if choice == "3days":
-        return (now + timedelta(days=3)).replace(hour=12, minute=0, second=0, microsecond=0)
+        return to_utc((now + timedelta(days=3)).replace(hour=12, minute=0, second=0, microsecond=0))
     return None
 
 
@@ -163,6 +153,9 @@ async def add_client_next_contact(
     callback: CallbackQuery,
     state: FSMContext,
 ) -> None:
+    data = await state.get_data()
+    if data.get("next_client_id"):
+        return await handle_next_for_existing(callback, state)
     choice = callback.data.split(":", 1)[1]
     await state.update_data(next_contact=choice)
     data = await state.get_data()
@@ -181,19 +174,20 @@ async def add_client_next_contact(
         interest=interest,
         next_contact_at=next_contact_at,
     )
+
+    async def add_client(session: AsyncSession) -> None:
+        session.add(client)
+
+    try:
+        await write_queue.submit(add_client)
+    except IntegrityError:
+        await callback.message.answer("Клиент с таким телефоном уже существует.")
+        await callback.answer()
+        return
     async with get_session() as session:
-        try:
-            session.add(client)
-            await session.commit()
-        except IntegrityError:
-            await session.rollback()
-            await callback.message.answer("Клиент с таким телефоном уже существует.")
-            await callback.answer()
-            return
-
-        last_interaction = await get_last_interaction(session, client.id)
-        message_text = format_client(client, last_interaction)
+        message_text = format_client(await load_client_card(session, client.id))
 
+    reminder_scheduler.schedule(client.id, client.next_contact_at, callback.message.chat.id)
     await callback.message.answer(
         message_text, parse_mode=ParseMode.HTML, reply_markup=main_menu()
     )
@@ -202,50 +196,50 @@ async def add_client_next_contact(
 
 @router.message(F.text == "📋 Мои клиенты")
 async def list_clients(message: Message) -> None:
-    statuses = await get_existing_company_statuses()
-    keyboard = build_status_filter_keyboard("clients", statuses)
-    await message.answer("Выберите фильтр по статусу компании", reply_markup=keyboard)
+    facets = await get_facets("clients")
+    keyboard = build_facet_filter_keyboard("clients", facets)
+    await message.answer(FILTER_PROMPT, reply_markup=keyboard)
+
+
+@router.callback_query(F.data.startswith("clients_filter:"))
+async def filter_clients(callback: CallbackQuery) -> None:
+    spec = CompanyFilter.unpack(callback.data.split(":")[1])
+    facets = await get_facets("clients", spec)
+    await callback.message.edit_text(FILTER_PROMPT, reply_markup=build_facet_filter_keyboard("clients", facets, spec))
+    await callback.answer()
 
 
 @router.callback_query(F.data.startswith("clients:"))
 async def paginate_clients(callback: CallbackQuery) -> None:
-    _, filter_name, page_str = callback.data.split(":")
-    page = int(page_str)
-    filtered_stmt = select(Client)
-    if filter_name.startswith("status-"):
-        status_value = filter_name.split("-", 1)[1]
-        filtered_stmt = filtered_stmt.join(Client.company).where(
-            Company.status == CompanyStatus(status_value)
-        )
-        count_stmt = select(func.count()).select_from(filtered_stmt.subquery())
-        paged_stmt = (
-            filtered_stmt.order_by(Client.created_at.desc())
-            .offset(page * PAGE_SIZE)
-            .limit(PAGE_SIZE)
-        )
+    _, filter_value, cursor = callback.data.split(":")
+    spec = CompanyFilter.unpack(filter_value)
+    filter_name = spec.pack()
+    filtered_stmt = clients_query(spec)
+    tables = ("clients",) if spec.is_empty else ("clients", "companies", "suggestions")
     async with get_session() as session:
-        total_count = (await session.execute(count_stmt)).scalar_one()
-        result = await session.execute(paged_stmt)
-        clients = result.scalars().all()
+        total_count = await cached_count(session, f"clients:{filter_name}", filtered_stmt, tables)
+        page = await fetch_keyset_page(session, filtered_stmt, Client, cursor, PAGE_SIZE)
 
     keyboard_rows = []
-    for client in clients:
+    for client in page.items:
         keyboard_rows.append(
             [InlineKeyboardButton(text=client.name or client.phone, callback_data=f"client:{client.id}")]
         )
     nav_row = []
-    if page > 0:
-        nav_row.append(InlineKeyboardButton(text="◀️", callback_data=f"clients:{filter_name}:{page-1}"))
-    if len(clients) == PAGE_SIZE:
-        nav_row.append(InlineKeyboardButton(text="▶️", callback_data=f"clients:{filter_name}:{page+1}"))
+    if page.prev_cursor:
+        nav_row.append(InlineKeyboardButton(text="◀️", callback_data=f"clients:{filter_name}:{page.prev_cursor}"))
+    if page.next_cursor:
+        nav_row.append(InlineKeyboardButton(text="▶️", callback_data=f"clients:{filter_name}:{page.next_cursor}"))
     if nav_row:
         keyboard_rows.append(nav_row)
 
-    keyboard_rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="back:main_menu")])
-
-    if not keyboard_rows:
+    if not page.items:
         keyboard_rows.append([InlineKeyboardButton(text="Нет данных", callback_data="noop")])
 
+    keyboard_rows.append([filter_button("clients", spec)])
+
+    keyboard_rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="back:main_menu")])
+
     await callback.message.edit_text(
         f"Список клиентов({total_count}):",
         reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard_rows),
@@ -256,15 +250,13 @@ async def paginate_clients(callback: CallbackQuery) -> None:
 @router.callback_query(F.data.startswith("client:"))
 async def show_client(callback: CallbackQuery) -> None:
     client_id = int(callback.data.split(":")[1])
-    stmt = select(Client).where(Client.id == client_id)
     async with get_session() as session:
-        client = (await session.execute(stmt)).scalar_one_or_none()
-        if not client:
-            await callback.message.answer("Клиент не найден")
-            await callback.answer()
-            return
-        last_interaction = await get_last_interaction(session, client.id)
-        message_text = format_client(client, last_interaction)
+        client = await load_client_card(session, client_id)
+    if not client:
+        await callback.message.answer("Клиент не найден")
+        await callback.answer()
+        return
+    message_text = format_client(client)
 
     buttons = [[
         InlineKeyboardButton(text="✏️ Статус", callback_data=f"status_change:{client.id}"),
@@ -314,11 +306,12 @@ async def apply_status(callback: CallbackQuery, state: FSMContext) -> None:
     if change_type != "status" or not client_id:
         await callback.answer()
         return
-    async with get_session() as session:
+
+    async def set_status(session: AsyncSession) -> None:
         client = (await session.execute(select(Client).where(Client.id == client_id))).scalar_one()
         client.status = status
-        session.add(client)
-        await session.commit()
+
+    await write_queue.submit(set_status)
     await state.clear()
     await callback.message.answer("Статус обновлен")
     await callback.answer()
@@ -333,11 +326,12 @@ async def apply_interest(callback: CallbackQuery, state: FSMContext) -> None:
     if change_type != "interest" or not client_id:
         await callback.answer()
         return
-    async with get_session() as session:
+
+    async def set_interest(session: AsyncSession) -> None:
         client = (await session.execute(select(Client).where(Client.id == client_id))).scalar_one()
         client.interest = interest
-        session.add(client)
-        await session.commit()
+
+    await write_queue.submit(set_interest)
     await state.clear()
     await callback.message.answer("Интерес обновлен")
     await callback.answer()
@@ -363,39 +357,53 @@ async def save_comment(message: Message, state: FSMContext) -> None:
         await message.answer("Пропущено")
         return
     comment_text = message.text or ""
-    interaction = Interaction(
-        client_id=client_id,
-        result=InteractionResult.CALL,
-        status_after=ClientStatus.NEW,
-        comment=comment_text,
-    )
-    async with get_session() as session:
-        session.add(interaction)
-        await session.commit()
+
+    async def add_comment(session: AsyncSession) -> None:
+        session.add(
+            Interaction(
+                client_id=client_id,
+                result=InteractionResult.CALL,
+                status_after=ClientStatus.NEW,
+                comment=comment_text,
+            )
+        )
+
+    await write_queue.submit(add_comment)
     await message.answer("Комментарий сохранен")
     await state.clear()
 
 
+def format_interaction(interaction: Interaction) -> str:
+    return (
+        f"{to_local(interaction.created_at):%d.%m %H:%M} — {interaction.result.value} — "
+        f"{interaction.status_after.value}\n{interaction.comment or ''}"
+    )
+
+
 @router.callback_query(F.data.startswith("history:"))
 async def show_history(callback: CallbackQuery) -> None:
-    client_id = int(callback.data.split(":")[1])
-    stmt = (
-        select(Interaction)
-        .where(Interaction.client_id == client_id)
-        .order_by(Interaction.created_at.desc())
-        .limit(10)
-    )
+    # history:<id> — первая страница, history:<id>:<курсор> — листание
+    _, client_id_str, *rest = callback.data.split(":")
+    client_id = int(client_id_str)
+    cursor = rest[0] if rest else FIRST_PAGE
+    stmt = select(Interaction).where(Interaction.client_id == client_id)
     async with get_session() as session:
-        interactions = (await session.execute(stmt)).scalars().all()
-    if not interactions:
+        page = await fetch_keyset_page(session, stmt, Interaction, cursor, HISTORY_PAGE_SIZE)
+    if not page.items:
         await callback.message.answer("История пуста")
         await callback.answer()
         return
-    lines = [
-        f"{i.created_at:%d.%m %H:%M} — {i.result.value} — {i.status_after.value}\n{i.comment or ''}"
-        for i in interactions
-    ]
-    await callback.message.answer("\n\n".join(lines))
+    nav = []
+    if page.next_cursor:
+        nav.append(InlineKeyboardButton(text="◀️ Старше", callback_data=f"history:{client_id}:{page.next_cursor}"))
+    if page.prev_cursor:
+        nav.append(InlineKeyboardButton(text="Новее ▶️", callback_data=f"history:{client_id}:{page.prev_cursor}"))
+    chunks = split_message([format_interaction(interaction) for interaction in page.items])
+    for chunk in chunks[:-1]:
+        await callback.message.answer(chunk)
+    await callback.message.answer(
+        chunks[-1], reply_markup=InlineKeyboardMarkup(inline_keyboard=[nav]) if nav else None
+    )
     await callback.answer()
 
 
@@ -426,22 +434,25 @@ async def apply_call_result(
     if not client_id:
         await callback.answer()
         return
-    async with get_session() as session:
+
+    async def record_call(session: AsyncSession) -> None:
         client = (await session.execute(select(Client).where(Client.id == client_id))).scalar_one()
         client.status = status
-        interaction = Interaction(
-            client_id=client.id,
-            result=InteractionResult.CALL,
-            status_after=status,
-            comment=None,
+        session.add(
+            Interaction(
+                client_id=client.id,
+                result=InteractionResult.CALL,
+                status_after=status,
+                comment=None,
+            )
         )
-        session.add_all([client, interaction])
-        await session.commit()
+
+    await write_queue.submit(record_call)
     await state.clear()
     await callback.message.answer(
         "Результат звонка сохранен. Добавить комментарий текстом? Отправьте сообщение, либо '-' чтобы пропустить."
     )
-    await state.update_data(comment_client_id=client.id)
+    await state.update_data(comment_client_id=client_id)
     await state.set_state(AddClientStates.comment)
     await callback.answer()
 
@@ -457,10 +468,13 @@ async def handle_next_for_existing(
         return
     choice = callback.data.split(":", 1)[1]
     next_contact = resolve_next_contact(choice)
-    async with get_session() as session:
+
+    async def set_next_contact(session: AsyncSession) -> None:
         client = (await session.execute(select(Client).where(Client.id == client_id))).scalar_one()
         client.next_contact_at = next_contact
-        await session.commit()
+
+    await write_queue.submit(set_next_contact)
+    reminder_scheduler.schedule(client_id, next_contact, callback.message.chat.id)
     await callback.message.answer("Дата следующего контакта обновлена")
     await state.clear()
     await callback.answer()
@@ -469,15 +483,20 @@ async def handle_next_for_existing(
 @router.callback_query(F.data.startswith("delete_client:"))
 async def delete_client(callback: CallbackQuery) -> None:
     client_id = int(callback.data.split(":")[1])
-    async with get_session() as session:
+
+    async def remove_client(session: AsyncSession) -> bool:
         client = (
             await session.execute(select(Client).where(Client.id == client_id))
         ).scalar_one_or_none()
         if not client:
-            await callback.message.answer("Клиент уже удален")
-            await callback.answer()
-            return
+            return False
         await session.delete(client)
-        await session.commit()
+        return True
+
+    if not await write_queue.submit(remove_client):
+        await callback.message.answer("Клиент уже удален")
+        await callback.answer()
+        return
+    reminder_scheduler.cancel(client_id)
     await callback.message.answer("Клиент удален")
     await callback.answer()
\ No newline at end of file
@@ -6,16 +6,23 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
-from sqlalchemy import func, select
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from company_filters import CompanyFilter, companies_query
 from config import PAGE_SIZE
 from db import get_session
 from keyboards import company_source_keyboard, company_status_keyboard, main_menu, priority_keyboard
-from handlers.filters import build_status_filter_keyboard, get_existing_company_statuses
+from list_counts import cached_count
+from handlers.filters import build_facet_filter_keyboard, filter_button, get_facets
 from models import Company, CompanySource, CompanyStatus, PriorityLevel, Suggestion, SuggestionType
+from pagination import FIRST_PAGE, fetch_keyset_page
+from writer import write_queue
 
 router = Router()
 
+FILTER_PROMPT = "Отметьте условия: статус, приоритет, источник, город или ниша"
+
 
 class AddCompanyStates(StatesGroup):
     name = State()
@@ -83,7 +90,8 @@ async def get_suggestions(suggestion_type: SuggestionType) -> list[str]:
 async def remember_suggestion(value: str | None, suggestion_type: SuggestionType) -> None:
     if not value:
         return
-    async with get_session() as session:
+
+    async def add_suggestion(session: AsyncSession) -> None:
         exists_stmt = select(Suggestion).where(
             Suggestion.type == suggestion_type, Suggestion.value == value
         )
@@ -91,7 +99,8 @@ async def remember_suggestion(value: str | None, suggestion_type: SuggestionType
         if exists:
             return
         session.add(Suggestion(type=suggestion_type, value=value))
-        await session.commit()
+
+    await write_queue.submit(add_suggestion)
 
 
 async def send_city_prompt(message: Message) -> None:
@@ -146,9 +155,11 @@ async def create_bulk_companies(
         )
         for phone, name in entries
     ]
-    async with get_session() as session:
+
+    async def add_companies(session: AsyncSession) -> None:
         session.add_all(companies)
-        await session.commit()
+
+    await write_queue.submit(add_companies)
 
 
 @router.message(F.text == "🏢 Добавить компанию")
@@ -301,8 +312,11 @@ async def company_contact(message: Message, state: FSMContext) -> None:
 
 @router.message(AddCompanyStates.note)
 async def company_note(message: Message, state: FSMContext) -> None:
-    note = None if message.text == "-" else message.text
     data = await state.get_data()
+    if data.get("change_type") == "note":
+        # Тот же state у редактирования комментария: этот обработчик зарегистрирован раньше
+        return await apply_company_note(message, state)
+    note = None if message.text == "-" else message.text
     company = Company(
         name=data.get("name"),
         city=data.get("city"),
@@ -313,41 +327,38 @@ async def company_note(message: Message, state: FSMContext) -> None:
         contact_person=data.get("contact_person"),
         note=note,
     )
-    async with get_session() as session:
+
+    async def add_company(session: AsyncSession) -> None:
         session.add(company)
-        await session.commit()
+
+    await write_queue.submit(add_company)
     await state.clear()
     await message.answer(format_company(company), parse_mode=ParseMode.HTML, reply_markup=main_menu())
 
 
-async def build_companies_page(filter_name: str, page: int) -> tuple[str, InlineKeyboardMarkup]:
-    filtered_stmt = select(Company)
-    if filter_name.startswith("status-"):
-        status_value = filter_name.split("-", 1)[1]
-        filtered_stmt = filtered_stmt.where(Company.status == CompanyStatus(status_value))
-        count_stmt = select(func.count()).select_from(filtered_stmt.subquery())
-        paged_stmt = (
-            filtered_stmt.order_by(Company.created_at.desc())
-            .offset(page * PAGE_SIZE)
-            .limit(PAGE_SIZE)
-        )
+async def build_companies_page(spec: CompanyFilter, cursor: str) -> tuple[str, InlineKeyboardMarkup]:
+    filter_name = spec.pack()
+    filtered_stmt = companies_query(spec)
     async with get_session() as session:
-        total_count = (await session.execute(count_stmt)).scalar_one()
-        companies = (await session.execute(paged_stmt)).scalars().all()
+        total_count = await cached_count(
+            session, f"companies:{filter_name}", filtered_stmt, ("companies", "suggestions")
+        )
+        page = await fetch_keyset_page(session, filtered_stmt, Company, cursor, PAGE_SIZE)
     rows = []
-    for comp in companies:
+    for comp in page.items:
         rows.append(
             [InlineKeyboardButton(text=f"{comp.name} ({comp.city or '-'})", callback_data=f"company:{comp.id}")]
         )
     nav = []
-    if page > 0:
-        nav.append(InlineKeyboardButton(text="◀️", callback_data=f"companies:{filter_name}:{page-1}"))
-    if len(companies) == PAGE_SIZE:
-        nav.append(InlineKeyboardButton(text="▶️", callback_data=f"companies:{filter_name}:{page+1}"))
+    if page.prev_cursor:
+        nav.append(InlineKeyboardButton(text="◀️", callback_data=f"companies:{filter_name}:{page.prev_cursor}"))
+    if page.next_cursor:
+        nav.append(InlineKeyboardButton(text="▶️", callback_data=f"companies:{filter_name}:{page.next_cursor}"))
     if nav:
         rows.append(nav)
+    rows.append([filter_button("companies", spec)])
     rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="back:main_menu")])
-    if not companies:
+    if not page.items:
         rows.insert(0, [InlineKeyboardButton(text="Нет компаний", callback_data="noop")])
 
     text = f"Компании({total_count}):"
@@ -356,24 +367,31 @@ async def build_companies_page(filter_name: str, page: int) -> tuple[str, Inline
 
 @router.message(F.text == "📂 Компании")
 async def list_companies(message: Message) -> None:
-    statuses = await get_existing_company_statuses()
-    keyboard = build_status_filter_keyboard("companies", statuses)
-    await message.answer("Выберите фильтр по статусу", reply_markup=keyboard)
+    facets = await get_facets("companies")
+    keyboard = build_facet_filter_keyboard("companies", facets)
+    await message.answer(FILTER_PROMPT, reply_markup=keyboard)
+
+
+@router.callback_query(F.data.startswith("companies_filter:"))
+async def filter_companies(callback: CallbackQuery) -> None:
+    spec = CompanyFilter.unpack(callback.data.split(":")[1])
+    facets = await get_facets("companies", spec)
+    await callback.message.edit_text(FILTER_PROMPT, reply_markup=build_facet_filter_keyboard("companies", facets, spec))
+    await callback.answer()
 
 
 @router.message(F.text == "Не звонили")
 async def list_not_called_companies(message: Message) -> None:
     text, keyboard = await build_companies_page(
-        f"status-{CompanyStatus.NOT_CALLED.value}", page=0
+        CompanyFilter(status=CompanyStatus.NOT_CALLED), FIRST_PAGE
     )
     await message.answer(text, reply_markup=keyboard)
 
 
 @router.callback_query(F.data.startswith("companies:"))
 async def paginate_companies(callback: CallbackQuery) -> None:
-    _, filter_name, page_str = callback.data.split(":")
-    page = int(page_str)
-    text, keyboard = await build_companies_page(filter_name, page)
+    _, filter_value, cursor = callback.data.split(":")
+    text, keyboard = await build_companies_page(CompanyFilter.unpack(filter_value), cursor)
 
     await callback.message.edit_text(text, reply_markup=keyboard)
     await callback.answer()
@@ -415,16 +433,20 @@ async def show_company(callback: CallbackQuery) -> None:
 @router.callback_query(F.data.startswith("comp_to_negotiation:"))
 async def set_company_to_negotiation(callback: CallbackQuery) -> None:
     company_id = int(callback.data.split(":")[1])
-    async with get_session() as session:
+
+    async def to_negotiation(session: AsyncSession) -> bool:
         company = (
             await session.execute(select(Company).where(Company.id == company_id))
         ).scalar_one_or_none()
         if not company:
-            await callback.message.answer("Компания не найдена")
-            await callback.answer()
-            return
+            return False
         company.status = CompanyStatus.NEGOTIATION
-        await session.commit()
+        return True
+
+    if not await write_queue.submit(to_negotiation):
+        await callback.message.answer("Компания не найдена")
+        await callback.answer()
+        return
     await callback.message.answer("Статус обновлен: Переговоры")
     await callback.answer()
 
@@ -461,10 +483,12 @@ async def apply_company_status(callback: CallbackQuery, state: FSMContext) -> No
     if data.get("change_type") != "status":
         await callback.answer()
         return
-    async with get_session() as session:
+
+    async def set_status(session: AsyncSession) -> None:
         company = (await session.execute(select(Company).where(Company.id == data.get("company_id")))).scalar_one()
         company.status = status
-        await session.commit()
+
+    await write_queue.submit(set_status)
     await state.clear()
     await callback.message.answer("Статус обновлен")
     await callback.answer()
@@ -477,10 +501,12 @@ async def apply_company_priority(callback: CallbackQuery, state: FSMContext) ->
     if data.get("change_type") != "priority":
         await callback.answer()
         return
-    async with get_session() as session:
+
+    async def set_priority(session: AsyncSession) -> None:
         company = (await session.execute(select(Company).where(Company.id == data.get("company_id")))).scalar_one()
         company.priority = level
-        await session.commit()
+
+    await write_queue.submit(set_priority)
     await state.clear()
     await callback.message.answer("Приоритет обновлен")
     await callback.answer()
@@ -491,10 +517,12 @@ async def apply_company_note(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
     if data.get("change_type") != "note":
         return
-    async with get_session() as session:
+
+    async def set_note(session: AsyncSession) -> None:
         company = (await session.execute(select(Company).where(Company.id == data.get("company_id")))).scalar_one()
         company.note = message.text
-        await session.commit()
+
+    await write_queue.submit(set_note)
     await state.clear()
     await message.answer("Комментарий обновлен")
 
@@ -502,15 +530,19 @@ async def apply_company_note(message: Message, state: FSMContext) -> None:
 @router.callback_query(F.data.startswith("delete_company:"))
 async def delete_company(callback: CallbackQuery) -> None:
     company_id = int(callback.data.split(":")[1])
-    async with get_session() as session:
+
+    async def remove_company(session: AsyncSession) -> bool:
         company = (
             await session.execute(select(Company).where(Company.id == company_id))
         ).scalar_one_or_none()
         if not company:
-            await callback.message.answer("Компания уже удалена")
-            await callback.answer()
-            return
+            return False
         await session.delete(company)
-        await session.commit()
+        return True
+
+    if not await write_queue.submit(remove_company):
+        await callback.message.answer("Компания уже удалена")
+        await callback.answer()
+        return
     await callback.message.answer("Компания удалена")
     await callback.answer()
\ No newline at end of file
@@ -1,41 +1,101 @@
 from __future__ import annotations
 
-from typing import Iterable
+from collections import Counter
+from dataclasses import replace
+from enum import Enum
+from typing import Any
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-from sqlalchemy import select
 
+from company_filters import CompanyFilter
 from db import get_session
-from models import Company, CompanyStatus
+from facets import Facets, collect_facets
+from models import CompanySource, CompanyStatus, PriorityLevel
+from pagination import FIRST_PAGE
 
 
-async def get_existing_company_statuses() -> list[CompanyStatus]:
+async def get_facets(scope: str, spec: CompanyFilter = CompanyFilter()) -> Facets:
     async with get_session() as session:
-        result = await session.execute(select(Company.status).distinct())
-        existing_statuses = set(result.scalars().all())
-    ordered_statuses = [status for status in CompanyStatus if status in existing_statuses]
-    return ordered_statuses
+        return await collect_facets(session, scope, spec)
 
 
-def build_status_filter_keyboard(
-    prefix: str, statuses: Iterable[CompanyStatus]
+def filter_button(prefix: str, spec: CompanyFilter) -> InlineKeyboardButton:
+    """Назад к выбору фильтра со списка: отмеченные условия сохраняются."""
+    return InlineKeyboardButton(text="🔎 Фильтр", callback_data=f"{prefix}_filter:{spec.pack()}")
+
+
+def _toggle(prefix: str, spec: CompanyFilter, name: str, value: Any, label: str, count: int) -> InlineKeyboardButton:
+    # Повторное нажатие снимает условие, нажатие на другое значение поля заменяет его
+    selected = getattr(spec, name) == value
+    toggled = replace(spec, **{name: None if selected else value})
+    return InlineKeyboardButton(
+        text=f"{'✅ ' if selected else ''}{label} ({count})",
+        callback_data=f"{prefix}_filter:{toggled.pack()}",
+    )
+
+
+def _rows(buttons: list[InlineKeyboardButton]) -> list[list[InlineKeyboardButton]]:
+    return [buttons[i : i + 2] for i in range(0, len(buttons), 2)]
+
+
+def _enum_rows(
+    prefix: str, spec: CompanyFilter, name: str, counts: Counter[Enum], icon: str, values: type[Enum]
+) -> list[list[InlineKeyboardButton]]:
+    return _rows(
+        [
+            _toggle(prefix, spec, name, value, f"{icon}{value.value}", counts[value])
+            for value in values
+            if counts[value] or getattr(spec, name) == value
+        ]
+    )
+
+
+def _suggestion_rows(
+    prefix: str,
+    spec: CompanyFilter,
+    name: str,
+    counts: Counter[tuple[int, str]],
+    top: list[tuple[tuple[int, str], int]],
+    icon: str,
+) -> list[list[InlineKeyboardButton]]:
+    selected = getattr(spec, name)
+    # Отмеченный город или нишу можно снять, даже если они не в топе
+    if selected is not None and all(suggestion_id != selected for (suggestion_id, _), _ in top):
+        top = top + [(key, count) for key, count in counts.items() if key[0] == selected]
+    return _rows(
+        [
+            _toggle(prefix, spec, name, suggestion_id, f"{icon}{value}", count)
+            for (suggestion_id, value), count in top
+        ]
+    )
+
+
+def build_facet_filter_keyboard(
+    prefix: str, facets: Facets, spec: CompanyFilter = CompanyFilter()
 ) -> InlineKeyboardMarkup:
+    """
+    Условия отмечаются по одному, каждое нажатие перерисовывает клавиатуру с
+    новым фильтром в callback_data "<prefix>_filter:<фильтр>"; "Показать"
+    открывает список с отмеченными условиями.
+    """
     buttons: list[list[InlineKeyboardButton]] = [
-        [InlineKeyboardButton(text="Все", callback_data=f"{prefix}:all:0")]
+        [
+            InlineKeyboardButton(
+                text=f"{'Все' if spec.is_empty else 'Показать'} ({facets.total})",
+                callback_data=f"{prefix}:{spec.pack()}:{FIRST_PAGE}",
+            )
+        ]
     ]
-    status_list = list(statuses)
-    for i in range(0, len(status_list), 2):
-        row_statuses = status_list[i : i + 2]
-        buttons.append(
-            [
-                InlineKeyboardButton(
-                    text=status.value,
-                    callback_data=f"{prefix}:status-{status.value}:0",
-                )
-                for status in row_statuses
-            ]
+    if not spec.is_empty:
+        buttons[0].append(
+            InlineKeyboardButton(text="✖️ Сбросить", callback_data=f"{prefix}_filter:{CompanyFilter().pack()}")
         )
-    if not status_list:
+    buttons.extend(_enum_rows(prefix, spec, "status", facets.statuses, "", CompanyStatus))
+    buttons.extend(_enum_rows(prefix, spec, "priority", facets.priorities, "🔥 ", PriorityLevel))
+    buttons.extend(_enum_rows(prefix, spec, "source", facets.sources, "📥 ", CompanySource))
+    buttons.extend(_suggestion_rows(prefix, spec, "city_id", facets.cities, facets.top_cities(), "🏙 "))
+    buttons.extend(_suggestion_rows(prefix, spec, "niche_id", facets.niches, facets.top_niches(), "🎯 "))
+    if not facets.statuses:
         buttons.append([InlineKeyboardButton(text="Нет данных", callback_data="noop")])
     buttons.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="back:main_menu")])
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
\ No newline at end of file
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+
+from aiogram import Router
+from aiogram.enums import ParseMode
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+
+from cards import load_client_cards
+from config import INLINE_CACHE_SIZE, INLINE_CACHE_TIME, INLINE_CACHE_TTL, INLINE_DEBOUNCE, INLINE_PAGE_SIZE
+from db import get_session
+from handlers.clients import format_client
+from models import Client
+from search_engine import SearchHit, search_entities
+from search_sessions import TTLCache
+
+router = Router()
+
+# Результаты по (пользователь, строка): набор "7701…" по букве и листание
+# next_offset берут уже найденное, а не ищут заново
+inline_results: TTLCache[tuple[int, str], list[SearchHit]] = TTLCache(INLINE_CACHE_SIZE, INLINE_CACHE_TTL)
+# Последний запрос каждого пользователя — чтобы отбрасывать устаревшие нажатия
+latest_queries: dict[int, str] = {}
+
+
+def detect_search_mode(query: str) -> str:
+    if any(ch.isalpha() for ch in query):
+        return "name"
+    return "phone"
+
+
+def build_inline_result(hit: SearchHit, card: Client | None = None) -> InlineQueryResultArticle:
+    icon = "👤" if hit.entity == "client" else "🏢"
+    if card:
+        content = InputTextMessageContent(
+            message_text=format_client(card), parse_mode=ParseMode.HTML
+        )
+    else:
+        content = InputTextMessageContent(message_text=f"{icon} {hit.title}")
+    return InlineQueryResultArticle(
+        id=f"{hit.entity}:{hit.id}",
+        title=f"{icon} {hit.title}",
+        input_message_content=content,
+    )
+
+
+async def wait_for_typing_pause(inline_query: InlineQuery) -> bool:
+    """True, если за время паузы пользователь не отправил следующий запрос."""
+    user_id = inline_query.from_user.id
+    latest_queries[user_id] = inline_query.id
+    await asyncio.sleep(INLINE_DEBOUNCE)
+    if latest_queries.get(user_id) != inline_query.id:
+        return False
+    del latest_queries[user_id]
+    return True
+
+
+@router.inline_query()
+async def inline_search(inline_query: InlineQuery) -> None:
+    query = inline_query.query.strip()
+    offset = int(inline_query.offset or 0)
+    if not query:
+        await inline_query.answer([], cache_time=INLINE_CACHE_TIME, is_personal=True)
+        return
+
+    key = (inline_query.from_user.id, query)
+    hits = inline_results.get(key)
+    if hits is None:
+        if not await wait_for_typing_pause(inline_query):
+            return
+        async with get_session() as session:
+            hits = await search_entities(session, detect_search_mode(query), query)
+        inline_results.set(key, hits)
+
+    page = hits[offset : offset + INLINE_PAGE_SIZE]
+    next_offset = str(offset + INLINE_PAGE_SIZE) if offset + INLINE_PAGE_SIZE < len(hits) else ""
+    # Карточки клиентов страницы — одним запросом, а не по запросу на результат
+    client_ids = [hit.id for hit in page if hit.entity == "client"]
+    cards = {}
+    if client_ids:
+        async with get_session() as session:
+            cards = await load_client_cards(session, client_ids)
+    await inline_query.answer(
+        [build_inline_result(hit, cards.get(hit.id) if hit.entity == "client" else None) for hit in page],
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=True,
+        next_offset=next_offset,
+    )
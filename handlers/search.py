@@ -4,18 +4,38 @@ from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
-from sqlalchemy import select
+from config import PHONE_SEARCH_MIN_DIGITS, SEARCH_PAGE_SIZE, SEARCH_RESULT_LIMIT
 from db import get_session
-from models import Client, Company
+from models import normalize_phone_for_search
+from search_engine import SearchHit, search_entities
+from search_sessions import SearchSessionStore
 
 
-def normalize_phone_for_search(value: str | None) -> str:
-    digits = "".join(ch for ch in value or "" if ch.isdigit())
-    if digits.startswith("8"):
-        digits = "7" + digits[1:]
-    return digits
-
 router = Router()
+search_sessions: SearchSessionStore[SearchHit] = SearchSessionStore()
+
+
+def results_header(total: int) -> str:
+    # Поиск отдаёт не больше SEARCH_RESULT_LIMIT строк — упёрлись, значит найдено больше
+    return f"Результаты({total}+):" if total >= SEARCH_RESULT_LIMIT else f"Результаты({total}):"
+
+
+def hit_button(hit: SearchHit) -> InlineKeyboardButton:
+    icon = "👤" if hit.entity == "client" else "🏢"
+    return InlineKeyboardButton(text=f"{icon} {hit.title}", callback_data=f"{hit.entity}:{hit.id}")
+
+
+def build_results_page(token: str, hits: list[SearchHit], page: int, total: int) -> InlineKeyboardMarkup:
+    rows = [[hit_button(hit)] for hit in hits]
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="◀️", callback_data=f"sr:{token}:{page-1}"))
+    if (page + 1) * SEARCH_PAGE_SIZE < total:
+        nav.append(InlineKeyboardButton(text="▶️", callback_data=f"sr:{token}:{page+1}"))
+    if nav:
+        rows.append(nav)
+    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="back:main_menu")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 class SearchStates(StatesGroup):
@@ -50,81 +70,33 @@ async def perform_search(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
     mode = data.get("mode")
     text = message.text or ""
-    results_buttons = []
+    if mode == "phone" and len(normalize_phone_for_search(text)) < PHONE_SEARCH_MIN_DIGITS:
+        # Состояние не сбрасываем — оператор просто вводит номер ещё раз
+        await message.answer(f"Введите хотя бы {PHONE_SEARCH_MIN_DIGITS} цифры номера")
+        return
     async with get_session() as session:
-        if mode == "phone":
-            normalized_query = normalize_phone_for_search(text)
-            client_stmt = select(Client)
-            for client in (await session.execute(client_stmt)).scalars().all():
-                if normalized_query in normalize_phone_for_search(client.phone):
-                    results_buttons.append(
-                        [
-                            InlineKeyboardButton(
-                                text=f"👤 {client.phone}", callback_data=f"client:{client.id}"
-                            )
-                        ]
-                    )
-
-            company_stmt = select(Company)
-            for company in (await session.execute(company_stmt)).scalars().all():
-                if normalized_query in normalize_phone_for_search(company.phone):
-                    results_buttons.append(
-                        [
-                            InlineKeyboardButton(
-                                text=f"🏢 {company.name}", callback_data=f"company:{company.id}"
-                            )
-                        ]
-                    )
-        elif mode == "name":
-            stmt = select(Client).where(Client.name.ilike(f"%{text}%"))  # type: ignore[arg-type]
-            for client in (await session.execute(stmt)).scalars().all():
-                results_buttons.append(
-                    [
-                        InlineKeyboardButton(
-                            text=f"👤 {client.name or client.phone}",
-                            callback_data=f"client:{client.id}",
-                        )
-                    ]
-                )
-
-                company_stmt = select(Company).where(Company.name.ilike(f"%{text}%"))  # type: ignore[arg-type]
-                for company in (await session.execute(company_stmt)).scalars().all():
-                    results_buttons.append(
-                        [
-                            InlineKeyboardButton(
-                                text=f"🏢 {company.name}", callback_data=f"company:{company.id}"
-                            )
-                        ]
-                )
-        elif mode == "company":
-            stmt = select(Company).where(Company.name.ilike(f"%{text}%"))  # type: ignore[arg-type]
-            for company in (await session.execute(stmt)).scalars().all():
-                results_buttons.append(
-                    [
-                        InlineKeyboardButton(
-                            text=f"🏢 {company.name}", callback_data=f"company:{company.id}"
-                        )
-                    ]
-                )
-
-                client_stmt = (
-                    select(Client)
-                    .join(Company)
-                    .where(Company.name.ilike(f"%{text}%"))  # type: ignore[arg-type]
-                )
-                for client in (await session.execute(client_stmt)).scalars().all():
-                    results_buttons.append(
-                        [
-                            InlineKeyboardButton(
-                                text=f"👤 {client.name or client.phone}",
-                                callback_data=f"client:{client.id}",
-                            )
-                        ]
-                )
+        hits = await search_entities(session, mode, text)
     await state.clear()
-    if not results_buttons:
+    if not hits:
         await message.answer("Ничего не найдено")
         return
+    token = search_sessions.put(hits)
     await message.answer(
-        "Результаты:", reply_markup=InlineKeyboardMarkup(inline_keyboard=results_buttons)
+        results_header(len(hits)),
+        reply_markup=build_results_page(token, hits[:SEARCH_PAGE_SIZE], 0, len(hits)),
+    )
+
+
+@router.callback_query(F.data.startswith("sr:"))
+async def paginate_search_results(callback: CallbackQuery) -> None:
+    _, token, page_str = callback.data.split(":")
+    page = int(page_str)
+    found = search_sessions.page(token, page, SEARCH_PAGE_SIZE)
+    if found is None:
+        await callback.answer("Результаты поиска устарели, повторите поиск", show_alert=True)
+        return
+    hits, total = found
+    await callback.message.edit_text(
+        results_header(total), reply_markup=build_results_page(token, hits, page, total)
     )
+    await callback.answer()
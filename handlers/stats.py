@@ -1,112 +1,134 @@
 from __future__ import annotations
 
-from datetime import date
+from datetime import datetime
 
 from aiogram import F, Router
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
-from sqlalchemy import func, select
+from aiogram.enums import ParseMode
+from aiogram.filters import Command
+from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from sqlalchemy import select
 
+from config import TASKS_PAGE_SIZE
 from db import get_session
-from models import Client, ClientStatus, Interaction, InterestLevel
+from models import Client, ClientStatus, InteractionResult, InterestLevel
+from rollups import Report, build_report
+from stats_engine import collect_stats
+from timeutils import local_day_bounds, naive_utc, to_local
 
 router = Router()
 
 
+def format_task_button(client: Client, day_start: datetime) -> InlineKeyboardButton:
+    due = to_local(client.next_contact_at)
+    label = f"{due:%H:%M}" if naive_utc(client.next_contact_at) >= day_start else f"⚠️ {due:%d.%m %H:%M}"
+    return InlineKeyboardButton(
+        text=f"{label} — {client.name or client.phone}",
+        callback_data=f"client:{client.id}",
+    )
+
+
+async def build_tasks_page(page: int) -> tuple[str, InlineKeyboardMarkup | None]:
+    day_start, day_end = local_day_bounds()
+    # Просроченные тоже попадают в список: всё, что запланировано до конца сегодняшнего дня
+    stmt = (
+        select(Client)
+        .where(Client.next_contact_at.is_not(None), Client.next_contact_at < day_end)
+        .order_by(Client.next_contact_at, Client.id)
+        .offset(page * TASKS_PAGE_SIZE)
+        .limit(TASKS_PAGE_SIZE + 1)
+    )
+    async with get_session() as session:
+        clients = (await session.execute(stmt)).scalars().all()
+
+    if not clients and page == 0:
+        return "На сегодня задач нет", None
+
+    rows = [[format_task_button(client, day_start)] for client in clients[:TASKS_PAGE_SIZE]]
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="◀️", callback_data=f"tasks:{page-1}"))
+    if len(clients) > TASKS_PAGE_SIZE:
+        nav.append(InlineKeyboardButton(text="▶️", callback_data=f"tasks:{page+1}"))
+    if nav:
+        rows.append(nav)
+    return "Клиенты для контакта сегодня:", InlineKeyboardMarkup(inline_keyboard=rows)
+
+
 @router.message(F.text == "⏰ Задачи на сегодня")
 async def tasks_today(message: Message) -> None:
-    today = date.today()
+    text, keyboard = await build_tasks_page(0)
+    await message.answer(text, reply_markup=keyboard)
 
-    async with get_session() as session:
-        stmt = select(Client).where(
-            func.date(Client.next_contact_at) == today  # type: ignore[arg-type]
-        )
-        result = await session.execute(stmt)
-        clients = result.scalars().all()
-
-    if not clients:
-        await message.answer("На сегодня задач нет")
-        return
-
-    buttons = [
-        [
-            InlineKeyboardButton(
-                text=client.name or client.phone,
-                callback_data=f"client:{client.id}",
-            )
-        ]
-        for client in clients
-    ]
-
-    await message.answer(
-        "Клиенты для контакта сегодня:",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons),
-    )
+
+@router.callback_query(F.data.startswith("tasks:"))
+async def paginate_tasks(callback: CallbackQuery) -> None:
+    page = int(callback.data.split(":")[1])
+    text, keyboard = await build_tasks_page(page)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
 
 
 @router.message(F.text == "📊 Статистика")
 async def stats(message: Message) -> None:
     async with get_session() as session:
-        result = await session.execute(select(func.count(Client.id)))
-        total_clients = result.scalar_one() or 0
+        client_stats = await collect_stats(session)
 
-        result = await session.execute(
-            select(func.count(Client.id)).where(Client.status == ClientStatus.NEW)
-        )
-        new_clients = result.scalar_one() or 0
-
-        result = await session.execute(
-            select(func.count(Client.id)).where(
-                Client.status.in_(
-                    [
-                        ClientStatus.PLANNED_CALL,
-                        ClientStatus.THINKING,
-                        ClientStatus.NO_ANSWER,
-                    ]
-                )
-            )
-        )
-        in_work = result.scalar_one() or 0
+    text = (
+        f"Всего клиентов: {client_stats.total}\n"
+        f"Новые: {client_stats.by_status[ClientStatus.NEW]}\n"
+        f"В работе: {client_stats.in_work}\n"
+        f"Согласились: {client_stats.by_status[ClientStatus.AGREED]}\n"
+        f"Отказались: {client_stats.by_status[ClientStatus.DECLINED]}\n\n"
+        f"Интерес — холодные: {client_stats.by_interest[InterestLevel.COLD]}, "
+        f"тёплые: {client_stats.by_interest[InterestLevel.WARM]}, "
+        f"горячие: {client_stats.by_interest[InterestLevel.HOT]}\n"
+        f"Контактов сегодня: {client_stats.today_interactions}"
+    )
 
-        result = await session.execute(
-            select(func.count(Client.id)).where(Client.status == ClientStatus.AGREED)
-        )
-        agreed = result.scalar_one() or 0
+    await message.answer(text)
 
-        result = await session.execute(
-            select(func.count(Client.id)).where(Client.status == ClientStatus.DECLINED)
-        )
-        declined = result.scalar_one() or 0
 
-        result = await session.execute(
-            select(func.count(Client.id)).where(Client.interest == InterestLevel.COLD)
-        )
-        cold = result.scalar_one() or 0
+RESULT_LABELS = {
+    InteractionResult.CALL: "звонков",
+    InteractionResult.MESSAGE: "сообщений",
+    InteractionResult.MEETING: "встреч",
+}
 
-        result = await session.execute(
-            select(func.count(Client.id)).where(Client.interest == InterestLevel.WARM)
-        )
-        warm = result.scalar_one() or 0
 
-        result = await session.execute(
-            select(func.count(Client.id)).where(Client.interest == InterestLevel.HOT)
-        )
-        hot = result.scalar_one() or 0
+def format_trend(current: int, previous: int) -> str:
+    if not previous:
+        return ""
+    change = round((current - previous) * 100 / previous)
+    return f" ({'▲' if change >= 0 else '▼'}{abs(change)}%)"
+
 
-        result = await session.execute(
-            select(func.count(Interaction.id)).where(
-                func.date(Interaction.created_at) == date.today()  # type: ignore[arg-type]
-            )
+def sparkline(values: list[int]) -> str:
+    bars = "▁▂▃▄▅▆▇█"
+    peak = max(values) or 1
+    return "".join(bars[value * (len(bars) - 1) // peak] for value in values)
+
+
+def format_report(report: Report) -> str:
+    blocks = ["📈 Отчёт"]
+    for days, window in report.current.items():
+        previous = report.previous[days]
+        results = ", ".join(
+            f"{label}: {window.by_result[result]}" for result, label in RESULT_LABELS.items()
         )
-        today_interactions = result.scalar_one() or 0
+        blocks.append(
+            f"<b>За {days} дн.</b>\n"
+            f"Контактов: {window.interactions}{format_trend(window.interactions, previous.interactions)}"
+            f" — {results}\n"
+            f"Согласились: {window.agreed}{format_trend(window.agreed, previous.agreed)}\n"
+            f"Новых клиентов: {window.created['clients']}, компаний: {window.created['companies']}"
+        )
+    blocks.append(f"Звонки за 14 дней: {sparkline(report.calls_per_day)}")
+    return "\n\n".join(blocks)
 
-    text = (
-        f"Всего клиентов: {total_clients}\n"
-        f"Новые: {new_clients}\n"
-        f"В работе: {in_work}\n"
-        f"Согласились: {agreed}\n"
-        f"Отказались: {declined}\n\n"
-        f"Интерес — холодные: {cold}, тёплые: {warm}, горячие: {hot}\n"
-        f"Контактов сегодня: {today_interactions}"
-    )
 
-    await message.answer(text)
+@router.message(Command("report"))
+async def report(message: Message) -> None:
+    # Агрегаты догоняет только фоновый rollup_loop: отчёт отстаёт не больше чем на ROLLUP_INTERVAL
+    async with get_session() as session:
+        data = await build_report(session)
+    await message.answer(format_report(data), parse_mode=ParseMode.HTML)
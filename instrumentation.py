@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import bisect
+import logging
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import SLOW_QUERY_MS
+from metrics import UPDATE_SAMPLE_KEY
+
+logger = logging.getLogger(__name__)
+
+# Обработчик aiogram, от имени которого идут запросы; вне обработчиков — фоновые задачи
+current_handler: ContextVar[str] = ContextVar("current_handler", default="-")
+
+# Верхние границы корзин гистограммы, миллисекунды; последняя — всё, что дольше
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_VALUES_LIST = re.compile(r"(\(\?\.\.\.\))(?:\s*,\s*\(\?\.\.\.\))+")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Текст запроса без литералов и с IN (?, ?, ...) свёрнутым в (?...), чтобы
+    запросы, различающиеся только значениями и длиной списков, считались одним.
+    """
+    sql = _SPACE.sub(" ", statement).strip()
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER_LIST.sub("?...", sql)
+    return _VALUES_LIST.sub(r"\1", sql)
+
+
+def _value_shape(value: Any) -> str:
+    return "None" if value is None else type(value).__name__
+
+
+def parameter_shape(parameters: Any, executemany: bool = False) -> str:
+    """Типы параметров без значений: в логе не должно оказаться телефонов и комментариев."""
+    if executemany:
+        rows = list(parameters)
+        return f"{len(rows)} × {parameter_shape(rows[0]) if rows else '()'}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {_value_shape(value)}" for key, value in parameters.items()) + "}"
+    return "(" + ", ".join(_value_shape(value) for value in parameters or ()) + ")"
+
+
+@dataclass
+class StatementStats:
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1))
+
+    def record(self, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def quantile_ms(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попадает квантиль q."""
+        rank = q * self.count
+        seen = 0
+        for bound, bucket in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += bucket
+            if seen >= rank:
+                return float(bound)
+        return self.max_ms
+
+
+# (нормализованный SQL, обработчик) -> статистика
+statement_stats: dict[tuple[str, str], StatementStats] = {}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed_ms = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+    key = (normalize_sql(statement), current_handler.get())
+    stats = statement_stats.get(key)
+    if stats is None:
+        stats = statement_stats[key] = StatementStats()
+    stats.record(elapsed_ms)
+    if elapsed_ms >= SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query %.1f ms in %s: %s params=%s",
+            elapsed_ms,
+            key[1],
+            key[0],
+            parameter_shape(parameters, executemany),
+        )
+
+
+def _handle_error(exception_context) -> None:
+    # after_cursor_execute для упавшего запроса не вызывается — снимаем его отметку
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument(engine: AsyncEngine) -> None:
+    """Вешает на движок замер каждого запроса; повторный вызов ничего не делает."""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+def top_statements(limit: int) -> list[tuple[str, str, StatementStats]]:
+    ranked = sorted(statement_stats.items(), key=lambda item: item[1].total_ms, reverse=True)
+    return [(sql, handler, stats) for (sql, handler), stats in ranked[:limit]]
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware: к этому моменту обработчик уже выбран, и его имя
+    попадает в current_handler для всех запросов, сделанных внутри, а также
+    в метрики апдейта, если они включены.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else type(event).__name__
+        sample = data.get(UPDATE_SAMPLE_KEY)
+        if sample is not None:
+            sample.handler = name
+        token = current_handler.set(name)
+        try:
+            return await handler(event, data)
+        finally:
+            current_handler.reset(token)
+
+
+class StatementCounter:
+    """
+    Число запросов к движку, пока открыт блок: with StatementCounter(engine) as counter.
+    BEGIN не считается — у SQLite его выдаёт db.make_engine, у Postgres драйвер.
+    """
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self._engine = engine.sync_engine
+        self.count = 0
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if statement != "BEGIN":
+            self.count += 1
+
+    def __enter__(self) -> StatementCounter:
+        event.listen(self._engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        event.remove(self._engine, "before_cursor_execute", self._count)
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from collections import Counter
+from itertools import chain
+
+from sqlalchemy import Select, event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+# Версия таблицы растёт с каждым коммитом, который её менял
+_versions: Counter[str] = Counter()
+_counts: dict[str, tuple[tuple[int, ...], int]] = {}
+
+
+@event.listens_for(Session, "after_flush")
+def _remember_tables(session: Session, flush_context) -> None:
+    touched = session.info.setdefault("touched_tables", set())
+    touched.update(obj.__table__.name for obj in chain(session.new, session.dirty, session.deleted))
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_versions(session: Session) -> None:
+    for table in session.info.pop("touched_tables", ()):
+        _versions[table] += 1
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_tables(session: Session) -> None:
+    session.info.pop("touched_tables", None)
+
+
+def tables_version(tables: tuple[str, ...]) -> tuple[int, ...]:
+    """Меняется после каждого коммита, затронувшего одну из tables."""
+    return tuple(_versions[table] for table in tables)
+
+
+async def cached_count(session: AsyncSession, key: str, stmt: Select, tables: tuple[str, ...]) -> int:
+    """count(*) по stmt; пересчитывается, только если с прошлого раза менялась одна из tables."""
+    version = tables_version(tables)
+    cached = _counts.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+    total = (await session.execute(select(func.count()).select_from(stmt.subquery()))).scalar_one()
+    _counts[key] = (version, total)
+    return total
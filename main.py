@@ -5,14 +5,22 @@ import logging
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 from sqlalchemy.ext.asyncio import AsyncEngine
 
-from config import TELEGRAM_BOT_TOKEN
-from db import Base, engine
+from config import ADMIN_IDS, METRICS_HOST, METRICS_PORT, TELEGRAM_API_URL, TELEGRAM_BOT_TOKEN
+from db import engine
 from handlers import router
+from instrumentation import HandlerNameMiddleware, instrument
+from metrics import UpdateMetricsMiddleware, start_metrics_server
+from migrations import upgrade_schema
+from reminders import reminder_scheduler
+from rollups import rollup_loop
+from writer import write_queue
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,17 +30,22 @@ logger = logging.getLogger(__name__)
 
 
 def setup_bot() -> Bot:
+    session = None
+    if TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
     # В aiogram 3.7+ parse_mode нужно передавать через DefaultBotProperties
     return Bot(
         token=TELEGRAM_BOT_TOKEN,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
 
 
 async def on_startup(engine: AsyncEngine) -> None:
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await upgrade_schema(engine)
     logger.info("Database tables ensured")
+    if not ADMIN_IDS:
+        logger.warning("ADMIN_IDS is empty: /dbstats and /rebuild_stats are disabled")
 
 
 async def set_commands(bot: Bot) -> None:
@@ -40,6 +53,7 @@ async def set_commands(bot: Bot) -> None:
         BotCommand(command="start", description="Главное меню"),
         BotCommand(command="add_client", description="Добавить клиента"),
         BotCommand(command="add_company", description="Добавить компанию"),
+        BotCommand(command="report", description="Отчёт за 7/30/90 дней"),
     ]
     await bot.set_my_commands(commands)
 
@@ -49,12 +63,31 @@ async def main() -> None:
     dp = Dispatcher(storage=MemoryStorage())
 
     dp.include_router(router)
+    # Внутренние middleware корневого роутера действуют и во вложенных
+    for observer in (dp.message, dp.callback_query, dp.inline_query):
+        observer.middleware(HandlerNameMiddleware())
+    instrument(engine)
+    metrics_runner = None
+    if METRICS_PORT:
+        dp.update.outer_middleware(UpdateMetricsMiddleware())
+        metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT)
 
     await on_startup(engine)
     await set_commands(bot)
 
+    write_queue.start()
+    rollup_task = asyncio.create_task(rollup_loop())
+    reminder_task = asyncio.create_task(reminder_scheduler.run(bot))
+
     logger.info("Starting bot")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        rollup_task.cancel()
+        reminder_task.cancel()
+        await write_queue.stop()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 
 if __name__ == "__main__":
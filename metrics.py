@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import bisect
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Верхние границы корзин гистограмм, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUEUE_DELAY_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Ключ в data обработчика: HandlerNameMiddleware записывает сюда выбранный обработчик
+UPDATE_SAMPLE_KEY = "update_sample"
+UNHANDLED = "unhandled"
+
+
+@dataclass
+class Histogram:
+    buckets: tuple[float, ...]
+    counts: list[int] = field(default_factory=list)
+    total: float = 0.0
+
+    def __post_init__(self) -> None:
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def exposition(self, name: str, labels: str) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        cumulative += self.counts[-1]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.total}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+@dataclass
+class UpdateSample:
+    update_type: str
+    handler: str = UNHANDLED
+
+
+class Metrics:
+    def __init__(self) -> None:
+        # (тип апдейта, обработчик) -> длительность обработки
+        self.durations: dict[tuple[str, str], Histogram] = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.errors: dict[tuple[str, str], int] = defaultdict(int)
+        self.in_flight: dict[str, int] = defaultdict(int)
+        # Тип апдейта -> время от отправки сообщения в Telegram до начала обработки
+        self.queue_delays: dict[str, Histogram] = defaultdict(lambda: Histogram(QUEUE_DELAY_BUCKETS))
+
+    def exposition(self) -> str:
+        """Текстовый формат Prometheus."""
+        lines = [
+            "# HELP crm_update_duration_seconds Время обработки апдейта.",
+            "# TYPE crm_update_duration_seconds histogram",
+        ]
+        for (update_type, handler), histogram in sorted(self.durations.items()):
+            labels = f'update_type="{update_type}",handler="{handler}"'
+            lines.extend(histogram.exposition("crm_update_duration_seconds", labels))
+        lines += [
+            "# HELP crm_update_errors_total Апдейты, обработка которых завершилась исключением.",
+            "# TYPE crm_update_errors_total counter",
+        ]
+        for (update_type, handler), count in sorted(self.errors.items()):
+            lines.append(f'crm_update_errors_total{{update_type="{update_type}",handler="{handler}"}} {count}')
+        lines += [
+            "# HELP crm_updates_in_flight Апдейты, обрабатываемые прямо сейчас.",
+            "# TYPE crm_updates_in_flight gauge",
+        ]
+        for update_type, count in sorted(self.in_flight.items()):
+            lines.append(f'crm_updates_in_flight{{update_type="{update_type}"}} {count}')
+        lines += [
+            "# HELP crm_update_queue_delay_seconds Задержка между отправкой сообщения и началом обработки.",
+            "# TYPE crm_update_queue_delay_seconds histogram",
+        ]
+        for update_type, histogram in sorted(self.queue_delays.items()):
+            lines.extend(histogram.exposition("crm_update_queue_delay_seconds", f'update_type="{update_type}"'))
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Внешний middleware на dp.update: время, ошибки и число одновременно
+    обрабатываемых апдейтов по типу и обработчику. Подключается только при
+    заданном METRICS_PORT, иначе ничего не стоит.
+    """
+
+    def __init__(self, registry: Metrics = metrics) -> None:
+        self.registry = registry
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        sample = UpdateSample(event.event_type)
+        data[UPDATE_SAMPLE_KEY] = sample
+        # Дата есть только у сообщений; у нажатий кнопок и inline-запросов её нет
+        sent_at = getattr(event.event, "date", None)
+        if sent_at is not None:
+            self.registry.queue_delays[sample.update_type].observe(max(time.time() - sent_at.timestamp(), 0.0))
+        self.registry.in_flight[sample.update_type] += 1
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.registry.errors[sample.update_type, sample.handler] += 1
+            raise
+        finally:
+            self.registry.durations[sample.update_type, sample.handler].observe(time.perf_counter() - started)
+            self.registry.in_flight[sample.update_type] -= 1
+
+
+async def start_metrics_server(host: str, port: int, registry: Metrics = metrics) -> web.AppRunner:
+    """Отдаёт /metrics на локальном порту; остановить — await runner.cleanup()."""
+
+    async def serve(request: web.Request) -> web.Response:
+        return web.Response(text=registry.exposition(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", serve)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Metrics on http://%s:%s/metrics", host, port)
+    return runner
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable
+
+from sqlalchemy import Connection, MetaData, bindparam, func, insert, inspect, select, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import CreateTable
+
+from counters import rebuild_counters
+from db import Base
+from fulltext import setup_fulltext
+from models import (
+    Client,
+    Company,
+    Interaction,
+    PhoneSuffix,
+    RollupCheckpoint,
+    SchemaVersion,
+    comment_preview,
+    copy_company_filters,
+    normalize_phone_for_search,
+    phone_suffix_rows,
+)
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHUNK_SIZE = 1000
+
+# Порция заполнения: получает id, после которого продолжать, и возвращает
+# последний обработанный id или None, когда строк не осталось
+Backfill = Callable[[Connection, int], "int | None"]
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    Шаг схемы. apply выполняется одной транзакцией, каждая порция backfills —
+    отдельной. Шаги идемпотентны: если процесс упал посередине, шаг повторится
+    целиком при следующем запуске.
+    """
+
+    version: int
+    name: str
+    apply: Callable[[Connection], None] | None = None
+    backfills: tuple[Backfill, ...] = ()
+
+
+def _create_tables(connection: Connection) -> None:
+    # В новой базе создаёт всё сразу, в старой — только недостающие таблицы
+    Base.metadata.create_all(connection)
+
+
+def _add_columns(**columns: tuple[str, ...]) -> Callable[[Connection], None]:
+    """Шаг, добавляющий колонки из моделей, которых ещё нет в таблицах (таблица=(колонки,))."""
+
+    def apply(connection: Connection) -> None:
+        inspector = inspect(connection)
+        for table_name, column_names in columns.items():
+            table = Base.metadata.tables[table_name]
+            existing = {column["name"] for column in inspector.get_columns(table_name)}
+            for name in column_names:
+                if name in existing:
+                    continue
+                column_type = table.c[name].type.compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {column_type}"))
+                logger.info("Added column %s.%s", table_name, name)
+
+    return apply
+
+
+def _create_indexes(connection: Connection) -> None:
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            # Индексы по колонкам из более поздних шагов создаст тот шаг, что их добавляет
+            if {column.name for column in index.columns} <= existing:
+                index.create(connection, checkfirst=True)
+
+
+# Заменены индексами (city, created_at, id) и (niche, created_at, id)
+_REPLACED_INDEXES = ("ix_companies_city_status_created_id", "ix_companies_niche_status_created_id")
+
+
+def _client_company_filters(connection: Connection) -> None:
+    _add_columns(
+        clients=("company_status", "company_priority", "company_source", "company_city", "company_niche")
+    )(connection)
+    for name in _REPLACED_INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    _create_indexes(connection)
+
+
+def _backfill_client_company_filters(connection: Connection, last_id: int) -> int | None:
+    client_ids = connection.execute(
+        select(Client.id).where(Client.id > last_id).order_by(Client.id).limit(BACKFILL_CHUNK_SIZE)
+    ).scalars().all()
+    if not client_ids:
+        return None
+    connection.execute(copy_company_filters(Client.id.between(client_ids[0], client_ids[-1])))
+    return client_ids[-1]
+
+
+# Таблицы, которые rollups читают по возрастанию id; источник в rollup_checkpoints зовётся так же
+_ROLLUP_SOURCES = ("companies", "clients", "interactions")
+
+
+def _sqlite_autoincrement(connection: Connection) -> None:
+    """
+    Пересоздаёт таблицы-источники агрегатов с AUTOINCREMENT: ALTER TABLE его не
+    добавляет. Строки и id переносятся как есть, индексы и триггеры поиска
+    создаются заново, а счётчик id начинается не ниже контрольной точки.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    # Копия схемы, чтобы новая таблица с другим именем не попала в Base.metadata
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(metadata)
+    for name in _ROLLUP_SOURCES:
+        ddl = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": name}
+        ).scalar_one()
+        if "AUTOINCREMENT" in ddl.upper():
+            continue
+        new_table = metadata.tables[name].to_metadata(metadata, name=f"{name}_rebuilt")
+        connection.execute(CreateTable(new_table))
+        columns = ", ".join(
+            column["name"]
+            for column in inspect(connection).get_columns(name)
+            if column["name"] in new_table.c
+        )
+        connection.execute(text(f"INSERT INTO {name}_rebuilt ({columns}) SELECT {columns} FROM {name}"))
+        connection.execute(text(f"DROP TABLE {name}"))
+        connection.execute(text(f"ALTER TABLE {name}_rebuilt RENAME TO {name}"))
+        # Последнюю строку могли удалить уже после прохода агрегатов — её id не выдаём снова
+        last_id = connection.execute(
+            select(RollupCheckpoint.last_id).where(RollupCheckpoint.source == name)
+        ).scalar_one_or_none()
+        connection.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": name})
+        connection.execute(
+            text(
+                "INSERT INTO sqlite_sequence (name, seq) "
+                f"SELECT :name, max(coalesce(max(id), 0), :last_id) FROM {name}"
+            ),
+            {"name": name, "last_id": last_id or 0},
+        )
+        logger.info("Rebuilt %s with AUTOINCREMENT", name)
+    _create_indexes(connection)
+    setup_fulltext(connection)
+
+
+def _backfill_phone_digits(model: type[Base], entity: str, connection: Connection, last_id: int) -> int | None:
+    rows = connection.execute(
+        select(model.id, model.phone)
+        .where(model.id > last_id, model.phone_digits.is_(None))
+        .order_by(model.id)
+        .limit(BACKFILL_CHUNK_SIZE)
+    ).all()
+    if not rows:
+        return None
+    values: list[dict] = []
+    suffixes: list[dict] = []
+    for row_id, phone in rows:
+        digits = normalize_phone_for_search(phone) or None
+        values.append({"row_id": row_id, "digits": digits})
+        suffixes.extend(phone_suffix_rows(entity, row_id, digits))
+    connection.execute(
+        update(model).where(model.id == bindparam("row_id")).values(phone_digits=bindparam("digits")),
+        values,
+    )
+    if suffixes:
+        connection.execute(insert(PhoneSuffix), suffixes)
+    return rows[-1][0]
+
+
+def _backfill_last_interactions(connection: Connection, last_id: int) -> int | None:
+    client_ids = connection.execute(
+        select(Client.id)
+        .where(Client.id > last_id, Client.last_interaction_at.is_(None))
+        .order_by(Client.id)
+        .limit(BACKFILL_CHUNK_SIZE)
+    ).scalars().all()
+    if not client_ids:
+        return None
+    ranked = (
+        select(
+            Interaction.client_id,
+            Interaction.created_at,
+            Interaction.result,
+            Interaction.comment,
+            func.row_number()
+            .over(
+                partition_by=Interaction.client_id,
+                order_by=(Interaction.created_at.desc(), Interaction.id.desc()),
+            )
+            .label("position"),
+        )
+        .where(Interaction.client_id.in_(client_ids))
+        .subquery()
+    )
+    values = [
+        {
+            "row_id": client_id,
+            "at": created_at,
+            "result": result,
+            "preview": comment_preview(comment),
+        }
+        for client_id, created_at, result, comment in connection.execute(
+            select(ranked.c.client_id, ranked.c.created_at, ranked.c.result, ranked.c.comment).where(
+                ranked.c.position == 1
+            )
+        )
+    ]
+    if values:
+        connection.execute(
+            update(Client)
+            .where(Client.id == bindparam("row_id"))
+            .values(
+                last_interaction_at=bindparam("at"),
+                last_interaction_result=bindparam("result"),
+                last_comment_preview=bindparam("preview"),
+            ),
+            values,
+        )
+    return client_ids[-1]
+
+
+# Новые шаги только дописываются в конец со следующим номером
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(1, "create_tables", _create_tables),
+    Migration(
+        2,
+        "phone_digits",
+        _add_columns(clients=("phone_digits",), companies=("phone_digits",)),
+        (partial(_backfill_phone_digits, Client, "client"), partial(_backfill_phone_digits, Company, "company")),
+    ),
+    Migration(
+        3,
+        "client_last_interaction",
+        _add_columns(clients=("last_interaction_at", "last_interaction_result", "last_comment_preview")),
+        (_backfill_last_interactions,),
+    ),
+    Migration(4, "stat_counters", rebuild_counters),
+    # clients.next_contact_at, clients.status, companies(status, created_at, id),
+    # interactions(client_id, created_at), фильтры и keyset-пагинация списков;
+    # suggestions(type, value) уже покрыт уникальным ограничением
+    Migration(5, "hot_path_indexes", _create_indexes),
+    Migration(6, "fulltext", setup_fulltext),
+    # rollup_gaps: запоздавшие коммиты ниже контрольной точки агрегатов
+    Migration(7, "rollup_gaps", _create_tables),
+    # clients.company_*: фильтры списка клиентов без JOIN, по индексам (поле, created_at, id)
+    Migration(8, "client_company_filters", _client_company_filters, (_backfill_client_company_filters,)),
+    # id источников агрегатов не переиспользуются после удаления последней строки
+    Migration(9, "sqlite_autoincrement", _sqlite_autoincrement),
+)
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(connection: Connection) -> int:
+    if not inspect(connection).has_table(SchemaVersion.__tablename__):
+        return 0
+    return connection.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+
+async def _apply(engine: AsyncEngine, migration: Migration) -> None:
+    if migration.apply:
+        async with engine.begin() as conn:
+            await conn.run_sync(migration.apply)
+    for backfill in migration.backfills:
+        last_id: int | None = 0
+        while last_id is not None:
+            async with engine.begin() as conn:
+                last_id = await conn.run_sync(backfill, last_id)
+    async with engine.begin() as conn:
+        await conn.execute(insert(SchemaVersion).values(version=migration.version, name=migration.name))
+    logger.info("Applied migration %s %s", migration.version, migration.name)
+
+
+async def upgrade_schema(engine: AsyncEngine) -> None:
+    """Применяет шаги MIGRATIONS новее записанной версии; для актуальной базы это один запрос."""
+    async with engine.connect() as conn:
+        version = await conn.run_sync(current_version)
+    if version >= LATEST_VERSION:
+        return
+    for migration in MIGRATIONS:
+        if migration.version > version:
+            await _apply(engine, migration)
@@ -1,14 +1,59 @@
 from __future__ import annotations
 
 import enum
-from datetime import datetime
-
-from sqlalchemy import DateTime, Enum, ForeignKey, Integer, String, Text, UniqueConstraint
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import date, datetime
+
+from sqlalchemy import (
+    Date,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    Update,
+    delete,
+    event,
+    inspect,
+    insert,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 
 from db import Base
 
 
+COMMENT_PREVIEW_LENGTH = 200
+
+
+def comment_preview(comment: str | None) -> str | None:
+    if comment and len(comment) > COMMENT_PREVIEW_LENGTH:
+        return comment[: COMMENT_PREVIEW_LENGTH - 1] + "…"
+    return comment
+
+
+def normalize_phone(value: str) -> str:
+    """Номер клиента в том виде, в каком он хранится: "+7…"."""
+    digits = "".join(ch for ch in value if ch.isdigit() or ch == "+")
+    if digits.startswith("8"):
+        digits = "+7" + digits[1:]
+    if not digits.startswith("+"):
+        digits = "+" + digits
+    return digits
+
+
+def normalize_phone_for_search(value: str | None) -> str:
+    digits = "".join(ch for ch in value or "" if ch.isdigit())
+    if digits.startswith("8"):
+        digits = "7" + digits[1:]
+    return digits
+
+
 class ClientStatus(str, enum.Enum):
     NEW = "new"
     PLANNED_CALL = "planned_call"
@@ -58,15 +103,38 @@ class SuggestionType(str, enum.Enum):
 
 class Client(Base):
     __tablename__ = "clients"
+    # Keyset-пагинация списков по (created_at, id), в том числе с фильтром по полям компании
+    __table_args__ = (
+        Index("ix_clients_created_id", "created_at", "id"),
+        Index("ix_clients_company_status_created_id", "company_status", "created_at", "id"),
+        Index("ix_clients_company_priority_created_id", "company_priority", "created_at", "id"),
+        Index("ix_clients_company_source_created_id", "company_source", "created_at", "id"),
+        Index("ix_clients_company_city_created_id", "company_city", "created_at", "id"),
+        Index("ix_clients_company_niche_created_id", "company_niche", "created_at", "id"),
+        # Без AUTOINCREMENT SQLite снова выдаёт id удалённой последней строки,
+        # и он оказывается ниже контрольной точки агрегатов (rollups)
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     phone: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
+    phone_digits: Mapped[str | None] = mapped_column(String(50), index=True)
     name: Mapped[str | None] = mapped_column(String(100))
-    company_id: Mapped[int | None] = mapped_column(ForeignKey("companies.id"))
+    company_id: Mapped[int | None] = mapped_column(ForeignKey("companies.id"), index=True)
     source: Mapped[str] = mapped_column(String(50), default="другое")
-    status: Mapped[ClientStatus] = mapped_column(Enum(ClientStatus), default=ClientStatus.NEW)
+    status: Mapped[ClientStatus] = mapped_column(Enum(ClientStatus), default=ClientStatus.NEW, index=True)
     interest: Mapped[InterestLevel] = mapped_column(Enum(InterestLevel), default=InterestLevel.COLD)
-    next_contact_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    next_contact_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), index=True)
+    # Копия последнего Interaction, обновляется вместе с его вставкой
+    last_interaction_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), index=True)
+    last_interaction_result: Mapped[InteractionResult | None] = mapped_column(Enum(InteractionResult))
+    last_comment_preview: Mapped[str | None] = mapped_column(String(COMMENT_PREVIEW_LENGTH))
+    # Копия полей компании для фильтров списка клиентов: без JOIN страница идёт по индексу
+    company_status: Mapped[CompanyStatus | None] = mapped_column(Enum(CompanyStatus))
+    company_priority: Mapped[PriorityLevel | None] = mapped_column(Enum(PriorityLevel))
+    company_source: Mapped[CompanySource | None] = mapped_column(Enum(CompanySource))
+    company_city: Mapped[str | None] = mapped_column(String(100))
+    company_niche: Mapped[str | None] = mapped_column(String(100))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow
@@ -77,15 +145,32 @@ class Client(Base):
         "Interaction", back_populates="client", cascade="all, delete-orphan"
     )
 
+    @validates("phone")
+    def _sync_phone_digits(self, key: str, value: str) -> str:
+        self.phone_digits = normalize_phone_for_search(value) or None
+        return value
+
 
 class Company(Base):
     __tablename__ = "companies"
+    # Списки с фильтрами (company_filters): равенства по полям, затем порядок (created_at, id)
+    __table_args__ = (
+        Index("ix_companies_status_created_id", "status", "created_at", "id"),
+        Index("ix_companies_created_id", "created_at", "id"),
+        Index("ix_companies_priority_created_id", "priority", "created_at", "id"),
+        Index("ix_companies_source_created_id", "source", "created_at", "id"),
+        Index("ix_companies_city_created_id", "city", "created_at", "id"),
+        Index("ix_companies_niche_created_id", "niche", "created_at", "id"),
+        Index("ix_companies_status_priority_created_id", "status", "priority", "created_at", "id"),
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(200), nullable=False)
     city: Mapped[str | None] = mapped_column(String(100))
     niche: Mapped[str | None] = mapped_column(String(100))
     phone: Mapped[str | None] = mapped_column(String(50))
+    phone_digits: Mapped[str | None] = mapped_column(String(50), index=True)
     site: Mapped[str | None] = mapped_column(String(200))
     source: Mapped[CompanySource] = mapped_column(Enum(CompanySource), default=CompanySource.FOUND)
     status: Mapped[CompanyStatus] = mapped_column(Enum(CompanyStatus), default=CompanyStatus.NOT_CALLED)
@@ -99,13 +184,19 @@ class Company(Base):
 
     clients: Mapped[list[Client]] = relationship("Client", back_populates="company", cascade="all, delete")
 
+    @validates("phone")
+    def _sync_phone_digits(self, key: str, value: str | None) -> str | None:
+        self.phone_digits = normalize_phone_for_search(value) or None
+        return value
+
 
 class Interaction(Base):
     __tablename__ = "interactions"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     client_id: Mapped[int] = mapped_column(ForeignKey("clients.id"))
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, index=True)
     result: Mapped[InteractionResult] = mapped_column(Enum(InteractionResult))
     status_after: Mapped[ClientStatus] = mapped_column(Enum(ClientStatus))
     comment: Mapped[str | None] = mapped_column(Text)
@@ -113,6 +204,15 @@ class Interaction(Base):
     client: Mapped[Client] = relationship("Client", back_populates="interactions")
 
 
+# История клиента листается от новых к старым по (created_at, id)
+Index(
+    "ix_interactions_client_created",
+    Interaction.client_id,
+    Interaction.created_at.desc(),
+    Interaction.id.desc(),
+)
+
+
 class Suggestion(Base):
     __tablename__ = "suggestions"
     __table_args__ = (UniqueConstraint("type", "value", name="uq_suggestion_type_value"),)
@@ -120,3 +220,202 @@ class Suggestion(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     type: Mapped[SuggestionType] = mapped_column(Enum(SuggestionType), nullable=False)
     value: Mapped[str] = mapped_column(String(100), nullable=False)
+
+
+class StatCounter(Base):
+    """Готовые счётчики для экрана статистики, обновляются вместе с данными."""
+
+    __tablename__ = "stat_counters"
+
+    metric: Mapped[str] = mapped_column(String(30), primary_key=True)
+    key: Mapped[str] = mapped_column(String(50), primary_key=True)
+    value: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class DailyInteractionRollup(Base):
+    __tablename__ = "daily_interaction_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    result: Mapped[InteractionResult] = mapped_column(Enum(InteractionResult), primary_key=True)
+    status_after: Mapped[ClientStatus] = mapped_column(Enum(ClientStatus), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class DailyCreationRollup(Base):
+    __tablename__ = "daily_creation_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    entity: Mapped[str] = mapped_column(String(10), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class SchemaVersion(Base):
+    """Применённые шаги migrations.MIGRATIONS; версия схемы — наибольший номер."""
+
+    __tablename__ = "schema_version"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+
+
+class RollupCheckpoint(Base):
+    """До какого id исходной таблицы строки уже разложены по дневным агрегатам."""
+
+    __tablename__ = "rollup_checkpoints"
+
+    source: Mapped[str] = mapped_column(String(30), primary_key=True)
+    last_id: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class RollupGap(Base):
+    """
+    Недостающий id чуть ниже контрольной точки: в Postgres строка с меньшим id
+    может закоммититься позже соседних, и её нужно добрать на следующем проходе.
+    """
+
+    __tablename__ = "rollup_gaps"
+
+    source: Mapped[str] = mapped_column(String(30), primary_key=True)
+    row_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    seen_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+
+class PhoneSuffix(Base):
+    """Все суффиксы нормализованного номера: поиск подстроки = поиск по префиксу суффикса."""
+
+    __tablename__ = "phone_suffixes"
+    __table_args__ = (Index("ix_phone_suffixes_lookup", "entity", "suffix", "entity_id"),)
+
+    entity: Mapped[str] = mapped_column(String(10), primary_key=True)
+    entity_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    suffix: Mapped[str] = mapped_column(String(50), primary_key=True)
+
+
+def phone_suffix_rows(entity: str, entity_id: int, digits: str | None) -> list[dict]:
+    if not digits:
+        return []
+    return [
+        {"entity": entity, "entity_id": entity_id, "suffix": digits[i:]}
+        for i in range(len(digits))
+    ]
+
+
+def _insert_phone_suffixes(connection: Connection, entity: str, entity_id: int, digits: str | None) -> None:
+    rows = phone_suffix_rows(entity, entity_id, digits)
+    if rows:
+        connection.execute(insert(PhoneSuffix), rows)
+
+
+def _replace_phone_suffixes(connection: Connection, entity: str, entity_id: int, digits: str | None) -> None:
+    connection.execute(
+        delete(PhoneSuffix).where(PhoneSuffix.entity == entity, PhoneSuffix.entity_id == entity_id)
+    )
+    _insert_phone_suffixes(connection, entity, entity_id, digits)
+
+
+def _register_phone_index(model: type[Base], entity: str) -> None:
+    @event.listens_for(model, "after_insert")
+    def _after_insert(mapper, connection: Connection, target) -> None:
+        # У только что вставленной строки суффиксов ещё нет — удалять нечего
+        _insert_phone_suffixes(connection, entity, target.id, target.phone_digits)
+
+    @event.listens_for(model, "after_update")
+    def _after_update(mapper, connection: Connection, target) -> None:
+        if inspect(target).attrs.phone_digits.history.has_changes():
+            _replace_phone_suffixes(connection, entity, target.id, target.phone_digits)
+
+    @event.listens_for(model, "after_delete")
+    def _after_delete(mapper, connection: Connection, target) -> None:
+        _replace_phone_suffixes(connection, entity, target.id, None)
+
+
+_register_phone_index(Client, "client")
+_register_phone_index(Company, "company")
+
+# Поля компании, скопированные в clients.company_<поле>
+COMPANY_FILTER_FIELDS = ("status", "priority", "source", "city", "niche")
+
+
+def copy_company_filters(*where) -> Update:
+    """
+    UPDATE clients, подтягивающий поля компании, — для строк, вставленных
+    мимо ORM (миграция, генератор данных). updated_at остаётся прежним.
+    """
+    return (
+        update(Client)
+        .where(Client.company_id.is_not(None), *where)
+        .values(
+            updated_at=Client.updated_at,
+            **{
+                f"company_{field}": select(getattr(Company, field))
+                .where(Company.id == Client.company_id)
+                .scalar_subquery()
+                for field in COMPANY_FILTER_FIELDS
+            },
+        )
+    )
+
+
+@event.listens_for(Client, "before_insert")
+@event.listens_for(Client, "before_update")
+def _copy_company_filters(mapper, connection: Connection, target: Client) -> None:
+    state = inspect(target)
+    if state.persistent and not state.attrs.company_id.history.has_changes():
+        return
+    values: dict = dict.fromkeys(COMPANY_FILTER_FIELDS)
+    # Компания обычно уже загружена (или только что вставлена) в этой же сессии
+    company = state.attrs.company.loaded_value
+    loaded = (
+        isinstance(company, Company)
+        and company.id == target.company_id
+        and not inspect(company).unloaded & set(COMPANY_FILTER_FIELDS)
+    )
+    if loaded:
+        values = {field: getattr(company, field) for field in COMPANY_FILTER_FIELDS}
+    elif target.company_id is not None:
+        row = connection.execute(
+            select(*(getattr(Company, field) for field in COMPANY_FILTER_FIELDS)).where(
+                Company.id == target.company_id
+            )
+        ).one_or_none()
+        if row is not None:
+            values = dict(zip(COMPANY_FILTER_FIELDS, row))
+    for field, value in values.items():
+        setattr(target, f"company_{field}", value)
+
+
+@event.listens_for(Company, "after_update")
+def _propagate_company_filters(mapper, connection: Connection, target: Company) -> None:
+    attrs = inspect(target).attrs
+    if not any(getattr(attrs, field).history.has_changes() for field in COMPANY_FILTER_FIELDS):
+        return
+    connection.execute(
+        update(Client)
+        .where(Client.company_id == target.id)
+        .values(
+            updated_at=Client.updated_at,
+            **{f"company_{field}": getattr(target, field) for field in COMPANY_FILTER_FIELDS},
+        )
+    )
+
+
+def last_interaction_values(interaction: Interaction) -> dict:
+    return {
+        "last_interaction_at": interaction.created_at,
+        "last_interaction_result": interaction.result,
+        "last_comment_preview": comment_preview(interaction.comment),
+    }
+
+
+@event.listens_for(Interaction, "after_insert")
+def _update_client_last_interaction(mapper, connection: Connection, target: Interaction) -> None:
+    # Та же транзакция, что и вставка; более старая запись (задним числом) поля не перетирает
+    connection.execute(
+        update(Client)
+        .where(
+            Client.id == target.client_id,
+            or_(Client.last_interaction_at.is_(None), Client.last_interaction_at <= target.created_at),
+        )
+        .values(**last_interaction_values(target))
+    )
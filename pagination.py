@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import string
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from timeutils import naive_utc
+
+FIRST_PAGE = "0"
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_DIGITS = string.digits + string.ascii_lowercase
+
+
+def _to_base36(value: int) -> str:
+    digits = ""
+    while True:
+        value, rest = divmod(value, 36)
+        digits = _DIGITS[rest] + digits
+        if not value:
+            return digits
+
+
+@dataclass
+class Cursor:
+    """Граница страницы: "a" — строки старше (created_at, id), "b" — новее."""
+
+    direction: str
+    created_at: datetime
+    id: int
+
+    def encode(self) -> str:
+        # Укладывается в лимит callback_data (64 байта): ~16 символов вместо ISO-даты
+        micros = (self.created_at - _EPOCH) // _MICROSECOND
+        return f"{self.direction}{_to_base36(micros)}.{_to_base36(self.id)}"
+
+    @classmethod
+    def decode(cls, value: str) -> Cursor | None:
+        """
+        Всё, что не разбирается как курсор, — первая страница: под старыми
+        сообщениями остались кнопки с номерами страниц ("clients:...:3").
+        """
+        direction = value[:1]
+        if direction not in ("a", "b"):
+            return None
+        try:
+            micros, row_id = value[1:].split(".")
+            return cls(direction, _EPOCH + int(micros, 36) * _MICROSECOND, int(row_id, 36))
+        except (ValueError, OverflowError):
+            return None
+
+    @classmethod
+    def at(cls, direction: str, row: Any) -> Cursor:
+        return cls(direction, naive_utc(row.created_at), row.id)
+
+
+@dataclass
+class KeysetPage:
+    items: list[Any]
+    prev_cursor: str | None
+    next_cursor: str | None
+
+
+def keyset_order(stmt: Select, model: type) -> Select:
+    return stmt.order_by(model.created_at.desc(), model.id.desc())
+
+
+async def fetch_keyset_page(
+    session: AsyncSession, stmt: Select, model: type, cursor_value: str, page_size: int
+) -> KeysetPage:
+    """
+    Страница списка, отсортированного по (created_at, id) от новых к старым.
+    Вместо OFFSET — условие на ключ последней показанной строки, поэтому
+    любая страница стоит как первая, а новые записи не сдвигают страницы.
+    """
+    cursor = Cursor.decode(cursor_value)
+    key = tuple_(model.created_at, model.id)
+    backward = cursor is not None and cursor.direction == "b"
+    if cursor is None:
+        stmt = keyset_order(stmt, model)
+    elif backward:
+        stmt = stmt.where(key > (cursor.created_at, cursor.id)).order_by(
+            model.created_at, model.id
+        )
+    else:
+        stmt = keyset_order(stmt.where(key < (cursor.created_at, cursor.id)), model)
+    rows = list((await session.execute(stmt.limit(page_size + 1))).scalars().all())
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backward:
+        rows.reverse()
+    if not rows:
+        return KeysetPage(rows, None, None)
+    has_prev = has_more if backward else cursor is not None
+    has_next = True if backward else has_more
+    return KeysetPage(
+        rows,
+        Cursor.at("b", rows[0]).encode() if has_prev else None,
+        Cursor.at("a", rows[-1]).encode() if has_next else None,
+    )
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from sqlalchemy import select
+
+from config import REMINDER_CHAT_IDS, REMINDER_LOOKAHEAD_HOURS
+from db import get_session
+from models import Client
+from timeutils import naive_utc
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderScheduler:
+    """
+    Напоминания о next_contact_at без опроса БД по таймеру: в памяти лежит
+    min-куча ближайших сроков, задача спит до первого из них. Обработчики
+    сообщают об изменениях через schedule()/cancel(). Из БД загружается только
+    окно [сейчас, сейчас + lookahead); когда окно заканчивается, грузится следующее.
+    """
+
+    def __init__(self, lookahead: timedelta = timedelta(hours=REMINDER_LOOKAHEAD_HOURS)) -> None:
+        self.lookahead = lookahead
+        self._heap: list[tuple[datetime, int]] = []
+        # Актуальный срок по клиенту; записи кучи с другим сроком считаются удалёнными
+        self._due: dict[int, datetime] = {}
+        self._chats: dict[int, int] = {}
+        self._horizon: datetime | None = None
+        self._wakeup = asyncio.Event()
+
+    def schedule(self, client_id: int, due: datetime | None, chat_id: int | None = None) -> None:
+        if due is None:
+            self.cancel(client_id)
+            return
+        if chat_id is not None:
+            self._chats[client_id] = chat_id
+        due = naive_utc(due)
+        if self._horizon is not None and due >= self._horizon:
+            # Попадёт в кучу при загрузке следующего окна
+            self._due.pop(client_id, None)
+            return
+        self._due[client_id] = due
+        heapq.heappush(self._heap, (due, client_id))
+        self._wakeup.set()
+
+    def cancel(self, client_id: int) -> None:
+        self._due.pop(client_id, None)
+        self._chats.pop(client_id, None)
+
+    def _next_deadline(self) -> datetime | None:
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        deadlines = [deadline for deadline in (self._horizon, self._heap[0][0] if self._heap else None) if deadline]
+        return min(deadlines) if deadlines else None
+
+    async def _load_window(self) -> None:
+        start = datetime.utcnow()
+        horizon = start + self.lookahead
+        stmt = select(Client.id, Client.next_contact_at).where(
+            Client.next_contact_at >= start, Client.next_contact_at < horizon
+        )
+        async with get_session() as session:
+            rows = (await session.execute(stmt)).all()
+        self._horizon = horizon
+        for client_id, due in rows:
+            due = naive_utc(due)
+            if self._due.get(client_id) != due:
+                self._due[client_id] = due
+                heapq.heappush(self._heap, (due, client_id))
+        logger.info("Loaded %s reminders until %s", len(rows), horizon)
+
+    async def _fire(self, bot: Bot, client_id: int, due: datetime) -> None:
+        chat_id = self._chats.pop(client_id, None)
+        async with get_session() as session:
+            client = (
+                await session.execute(select(Client).where(Client.id == client_id))
+            ).scalar_one_or_none()
+        # Срок могли поменять в обход планировщика (или удалить клиента вместе с компанией)
+        if client is None or client.next_contact_at is None or naive_utc(client.next_contact_at) != due:
+            return
+        keyboard = InlineKeyboardMarkup(
+            inline_keyboard=[[InlineKeyboardButton(text="Открыть карточку", callback_data=f"client:{client.id}")]]
+        )
+        for target in [chat_id] if chat_id else REMINDER_CHAT_IDS:
+            try:
+                await bot.send_message(
+                    target, f"⏰ Пора связаться: {client.name or client.phone}", reply_markup=keyboard
+                )
+            except TelegramAPIError:
+                logger.exception("Failed to send reminder for client %s to %s", client_id, target)
+
+    async def run(self, bot: Bot) -> None:
+        await self._load_window()
+        while True:
+            deadline = self._next_deadline()
+            timeout = (deadline - datetime.utcnow()).total_seconds() if deadline else None
+            self._wakeup.clear()
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            now = datetime.utcnow()
+            if self._horizon is not None and self._horizon <= now:
+                await self._load_window()
+                continue
+            while self._heap and self._heap[0][0] <= now:
+                due, client_id = heapq.heappop(self._heap)
+                if self._due.get(client_id) != due:
+                    continue
+                del self._due[client_id]
+                try:
+                    await self._fire(bot, client_id, due)
+                except Exception:
+                    logger.exception("Reminder for client %s failed", client_id)
+
+
+reminder_scheduler = ReminderScheduler()
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Sequence
+
+from sqlalchemy import Connection, Row, delete, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import ROLLUP_INTERVAL
+from db import upsert_increment
+from models import (
+    Client,
+    ClientStatus,
+    Company,
+    DailyCreationRollup,
+    DailyInteractionRollup,
+    Interaction,
+    InteractionResult,
+    RollupCheckpoint,
+    RollupGap,
+)
+from timeutils import local_today, to_local
+from writer import WriteQueue, write_queue
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_CHUNK_SIZE = 5000
+# Сколько id ниже новой контрольной точки проверяется на пропуски и сколько
+# пропуск ждёт запоздавшего коммита, прежде чем считаться удалённой строкой
+ROLLUP_GAP_WINDOW = 1000
+ROLLUP_GAP_TTL = timedelta(minutes=10)
+REPORT_WINDOWS = (7, 30, 90)
+
+
+def _checkpoint(connection: Connection, source: str) -> int:
+    last_id = connection.execute(
+        select(RollupCheckpoint.last_id).where(RollupCheckpoint.source == source)
+    ).scalar_one_or_none()
+    return last_id or 0
+
+
+def _advance(connection: Connection, source: str, last_id: int) -> None:
+    updated = connection.execute(
+        update(RollupCheckpoint).where(RollupCheckpoint.source == source).values(last_id=last_id)
+    )
+    if not updated.rowcount:
+        connection.execute(insert(RollupCheckpoint).values(source=source, last_id=last_id))
+
+
+def _new_rows(connection: Connection, source: str, model: Any, *columns: Any) -> Sequence[Row]:
+    """
+    Порция строк после контрольной точки и запоздавших строк из пропусков.
+    id выдаются до коммита, поэтому строка с меньшим id может появиться уже
+    после того, как точка ушла дальше: пропуски в последних ROLLUP_GAP_WINDOW
+    id запоминаются и перепроверяются, пока не истечёт ROLLUP_GAP_TTL.
+    """
+    last_id = _checkpoint(connection, source)
+    now = datetime.utcnow()
+    connection.execute(delete(RollupGap).where(RollupGap.source == source, RollupGap.seen_at < now - ROLLUP_GAP_TTL))
+    gaps = connection.execute(select(RollupGap.row_id).where(RollupGap.source == source)).scalars().all()
+    condition = model.id > last_id
+    if gaps:
+        condition = or_(condition, model.id.in_(gaps))
+    rows = connection.execute(
+        select(model.id, *columns).where(condition).order_by(model.id).limit(ROLLUP_CHUNK_SIZE)
+    ).all()
+    seen = {row.id for row in rows}
+    filled = [gap for gap in gaps if gap in seen]
+    if filled:
+        connection.execute(delete(RollupGap).where(RollupGap.source == source, RollupGap.row_id.in_(filled)))
+    if rows and rows[-1].id > last_id:
+        new_last_id = rows[-1].id
+        missing = [
+            {"source": source, "row_id": row_id, "seen_at": now}
+            for row_id in range(max(last_id, new_last_id - ROLLUP_GAP_WINDOW) + 1, new_last_id)
+            if row_id not in seen
+        ]
+        if missing:
+            connection.execute(insert(RollupGap), missing)
+        _advance(connection, source, new_last_id)
+    return rows
+
+
+def _roll_interactions(connection: Connection) -> int:
+    rows = _new_rows(
+        connection, "interactions", Interaction, Interaction.created_at, Interaction.result, Interaction.status_after
+    )
+    if not rows:
+        return 0
+    buckets: Counter[tuple[date, InteractionResult, ClientStatus]] = Counter(
+        (to_local(created_at).date(), result, status_after) for _, created_at, result, status_after in rows
+    )
+    upsert_increment(
+        connection,
+        DailyInteractionRollup,
+        "count",
+        [
+            {"day": day, "result": result, "status_after": status_after, "count": count}
+            for (day, result, status_after), count in buckets.items()
+        ],
+    )
+    return len(rows)
+
+
+def _roll_creations(connection: Connection, model: type[Client] | type[Company], entity: str) -> int:
+    rows = _new_rows(connection, entity, model, model.created_at)
+    if not rows:
+        return 0
+    buckets: Counter[date] = Counter(to_local(created_at).date() for _, created_at in rows)
+    upsert_increment(
+        connection,
+        DailyCreationRollup,
+        "count",
+        [{"day": day, "entity": entity, "count": count} for day, count in buckets.items()],
+    )
+    return len(rows)
+
+
+def roll_up(connection: Connection) -> int:
+    """Одна порция новых строк после контрольной точки; возвращает число обработанных строк."""
+    return (
+        _roll_interactions(connection)
+        + _roll_creations(connection, Client, "clients")
+        + _roll_creations(connection, Company, "companies")
+    )
+
+
+async def _roll_up_op(session: AsyncSession) -> int:
+    return await session.run_sync(lambda sync_session: roll_up(sync_session.connection()))
+
+
+async def run_rollups(queue: WriteQueue = write_queue) -> int:
+    """
+    Догоняет все новые строки, каждую порцию — отдельной операцией очереди
+    записи: пишет по-прежнему один писатель, и SQLite не отвечает
+    "database is locked" ни агрегатам, ни обработчикам.
+    """
+    total = 0
+    while True:
+        processed = await queue.submit(_roll_up_op)
+        total += processed
+        if not processed:
+            return total
+
+
+async def rollup_loop(queue: WriteQueue = write_queue, interval: float = ROLLUP_INTERVAL) -> None:
+    while True:
+        try:
+            processed = await run_rollups(queue)
+            if processed:
+                logger.info("Rolled up %s rows", processed)
+        except Exception:
+            logger.exception("Rollup failed")
+        await asyncio.sleep(interval)
+
+
+@dataclass
+class WindowReport:
+    days: int
+    by_result: Counter[InteractionResult] = field(default_factory=Counter)
+    agreed: int = 0
+    created: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def interactions(self) -> int:
+        return sum(self.by_result.values())
+
+
+@dataclass
+class Report:
+    current: dict[int, WindowReport]
+    previous: dict[int, WindowReport]
+    calls_per_day: list[int]
+
+
+async def build_report(session: AsyncSession) -> Report:
+    """Текущие окна 7/30/90 дней и предыдущие окна той же длины — два запроса к агрегатам."""
+    today = local_today()
+    since = today - timedelta(days=2 * max(REPORT_WINDOWS) - 1)
+    current = {days: WindowReport(days) for days in REPORT_WINDOWS}
+    previous = {days: WindowReport(days) for days in REPORT_WINDOWS}
+    calls_per_day = [0] * 14
+
+    def windows_for(day: date):
+        age = (today - day).days
+        for days in REPORT_WINDOWS:
+            if age < days:
+                yield current[days]
+            elif age < 2 * days:
+                yield previous[days]
+
+    interactions = await session.execute(
+        select(
+            DailyInteractionRollup.day,
+            DailyInteractionRollup.result,
+            DailyInteractionRollup.status_after,
+            DailyInteractionRollup.count,
+        ).where(DailyInteractionRollup.day >= since)
+    )
+    for day, result, status_after, count in interactions.all():
+        for window in windows_for(day):
+            window.by_result[result] += count
+            if status_after == ClientStatus.AGREED:
+                window.agreed += count
+        age = (today - day).days
+        if result == InteractionResult.CALL and age < len(calls_per_day):
+            calls_per_day[-1 - age] += count
+
+    creations = await session.execute(
+        select(DailyCreationRollup.day, DailyCreationRollup.entity, DailyCreationRollup.count).where(
+            DailyCreationRollup.day >= since
+        )
+    )
+    for day, entity, count in creations.all():
+        for window in windows_for(day):
+            window.created[entity] += count
+    return Report(current=current, previous=previous, calls_per_day=calls_per_day)
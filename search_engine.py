@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from sqlalchemy import Select, and_, func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import PHONE_SEARCH_MIN_DIGITS, SEARCH_RESULT_LIMIT
+from fulltext import fulltext_hits
+from models import Client, Company, PhoneSuffix, normalize_phone_for_search
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    entity: str  # "client" или "company"
+    id: int
+    title: str
+
+
+def phone_match_ids(entity: str, digits: str) -> Select:
+    # "abc" входит в номер <=> какой-то суффикс номера начинается с "abc";
+    # ":" следует сразу за "9", поэтому диапазон покрывает все такие суффиксы по индексу
+    return select(PhoneSuffix.entity_id).where(
+        PhoneSuffix.entity == entity,
+        PhoneSuffix.suffix >= digits,
+        PhoneSuffix.suffix < digits + ":",
+    )
+
+
+def _phone_query(digits: str, limit: int) -> Select:
+    clients = select(
+        literal("client").label("entity"),
+        Client.id.label("id"),
+        Client.phone.label("title"),
+        literal(0).label("ord"),
+    ).where(Client.id.in_(phone_match_ids("client", digits)))
+    companies = select(
+        literal("company").label("entity"),
+        Company.id.label("id"),
+        Company.name.label("title"),
+        literal(1).label("ord"),
+    ).where(Company.id.in_(phone_match_ids("company", digits)))
+    found = union_all(clients, companies).subquery()
+    return (
+        select(found.c.entity, found.c.id, found.c.title)
+        .order_by(found.c.ord, found.c.id)
+        .limit(limit)
+    )
+
+
+def _text_query(dialect_name: str, mode: str, text: str, limit: int) -> Select | None:
+    # "По имени" ищет по всем полям, "По компании" — по карточкам компаний
+    # и добавляет клиентов найденных компаний сразу после них
+    kinds = ("client", "company", "interaction") if mode == "name" else ("company",)
+    hits_stmt = fulltext_hits(dialect_name, text, kinds, limit)
+    if hits_stmt is None:
+        return None
+    hits = hits_stmt.cte("hits")
+    client_title = func.coalesce(Client.name, Client.phone)
+    parts = [
+        select(
+            literal("company").label("entity"),
+            Company.id.label("id"),
+            Company.name.label("title"),
+            hits.c.score,
+            literal(0).label("ord"),
+        ).join_from(hits, Company, and_(hits.c.entity == "company", Company.id == hits.c.ref_id)),
+        select(
+            literal("client").label("entity"),
+            Client.id.label("id"),
+            client_title.label("title"),
+            hits.c.score,
+            literal(0).label("ord"),
+        ).join_from(hits, Client, and_(hits.c.entity == "client", Client.id == hits.c.ref_id)),
+    ]
+    if mode == "company":
+        parts.append(
+            select(
+                literal("client").label("entity"),
+                Client.id.label("id"),
+                client_title.label("title"),
+                hits.c.score,
+                literal(1).label("ord"),
+            ).join_from(
+                hits, Client, and_(hits.c.entity == "company", Client.company_id == hits.c.ref_id)
+            )
+        )
+    found = union_all(*parts).subquery()
+    # Одна и та же запись может прийти несколькими путями — оставляем лучшую позицию
+    return (
+        select(found.c.entity, found.c.id, found.c.title)
+        .group_by(found.c.entity, found.c.id, found.c.title)
+        .order_by(func.min(found.c.score), func.min(found.c.ord), found.c.id)
+        .limit(limit)
+    )
+
+
+def build_search_query(
+    dialect_name: str, mode: str, text: str, limit: int = SEARCH_RESULT_LIMIT
+) -> Select | None:
+    """Один запрос на режим поиска; None, если по такой строке искать нечего."""
+    if mode == "phone":
+        digits = normalize_phone_for_search(text)
+        return _phone_query(digits, limit) if len(digits) >= PHONE_SEARCH_MIN_DIGITS else None
+    if mode in ("name", "company"):
+        return _text_query(dialect_name, mode, text, limit)
+    return None
+
+
+async def search_entities(
+    session: AsyncSession, mode: str, text: str, limit: int = SEARCH_RESULT_LIMIT
+) -> list[SearchHit]:
+    stmt = build_search_query(session.bind.dialect.name, mode, text, limit)
+    if stmt is None:
+        return []
+    result = await session.execute(stmt)
+    return [SearchHit(entity, int(entity_id), title or "") for entity, entity_id, title in result.all()]
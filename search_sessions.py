@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import secrets
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+from config import SEARCH_SESSION_TTL, SEARCH_SESSIONS_MAX
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+class TTLCache(Generic[K, T]):
+    """LRU-кэш в памяти процесса, записи которого живут не дольше ttl секунд."""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: OrderedDict[K, tuple[float, T]] = OrderedDict()
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key) is not None
+
+    def set(self, key: K, value: T) -> None:
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def get(self, key: K) -> T | None:
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+
+class SearchSessionStore(Generic[T]):
+    """
+    Результаты поиска под коротким токеном, который помещается в callback_data,
+    поэтому листание страниц не повторяет поиск.
+    """
+
+    def __init__(self, max_size: int = SEARCH_SESSIONS_MAX, ttl: float = SEARCH_SESSION_TTL) -> None:
+        self._cache: TTLCache[str, list[T]] = TTLCache(max_size, ttl)
+
+    def put(self, items: list[T]) -> str:
+        token = secrets.token_urlsafe(6)
+        while token in self._cache:
+            token = secrets.token_urlsafe(6)
+        self._cache.set(token, items)
+        return token
+
+    def get(self, token: str) -> list[T] | None:
+        return self._cache.get(token)
+
+    def page(self, token: str, page: int, page_size: int) -> tuple[list[T], int] | None:
+        """Срез страницы и общее число результатов; None, если сессия истекла."""
+        items = self.get(token)
+        if items is None:
+            return None
+        return items[page * page_size : (page + 1) * page_size], len(items)
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from counters import CLIENTS, INTERACTIONS_PER_DAY
+from models import ClientStatus, InterestLevel, StatCounter
+from timeutils import local_today
+
+IN_WORK_STATUSES = (ClientStatus.PLANNED_CALL, ClientStatus.THINKING, ClientStatus.NO_ANSWER)
+
+
+@dataclass
+class ClientStats:
+    by_status: Counter[ClientStatus] = field(default_factory=Counter)
+    by_interest: Counter[InterestLevel] = field(default_factory=Counter)
+    today_interactions: int = 0
+
+    @property
+    def total(self) -> int:
+        return sum(self.by_status.values())
+
+    @property
+    def in_work(self) -> int:
+        return sum(self.by_status[status] for status in IN_WORK_STATUSES)
+
+
+async def collect_stats(session: AsyncSession) -> ClientStats:
+    """Экран статистики читается из готовых счётчиков одним запросом."""
+    stats = ClientStats()
+    today = local_today().isoformat()
+    result = await session.execute(
+        select(StatCounter.metric, StatCounter.key, StatCounter.value).where(
+            or_(
+                StatCounter.metric == CLIENTS,
+                and_(StatCounter.metric == INTERACTIONS_PER_DAY, StatCounter.key == today),
+            )
+        )
+    )
+    for metric, key, value in result.all():
+        if metric == CLIENTS:
+            status, interest = key.split(":")
+            stats.by_status[ClientStatus(status)] += value
+            stats.by_interest[InterestLevel(interest)] += value
+        else:
+            stats.today_interactions = value
+    return stats
@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# db.engine создаётся при импорте по DATABASE_URL — окружение задаётся до импорта модулей бота
+_workdir = Path(tempfile.mkdtemp(prefix="crm-tests-"))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:tests")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_workdir / 'bot.db'}"
+os.environ["DB_PROFILE"] = "development"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
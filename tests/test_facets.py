@@ -0,0 +1,66 @@
+"""
+Счётчики на кнопках фильтра совпадают с тем, что покажет список: значение
+поля считается по остальным отмеченным условиям, как если бы его выбрали.
+"""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+import facets
+from bench.dataset import DatasetSpec, generate
+from company_filters import CompanyFilter, clients_query, companies_query
+from db import make_engine
+from facets import collect_facets
+from models import CompanySource, CompanyStatus, PriorityLevel
+
+QUERIES = {"companies": companies_query, "clients": clients_query}
+SPECS = (
+    CompanyFilter(),
+    CompanyFilter(status=CompanyStatus.NOT_CALLED),
+    CompanyFilter(status=CompanyStatus.NOT_CALLED, priority=PriorityLevel.LOW),
+    CompanyFilter(priority=PriorityLevel.HIGH, source=CompanySource.FOUND, city_id=1),
+)
+
+
+async def _count(session: AsyncSession, scope: str, spec: CompanyFilter) -> int:
+    stmt = select(func.count()).select_from(QUERIES[scope](spec).subquery())
+    return (await session.execute(stmt)).scalar_one()
+
+
+async def _check(engine: AsyncEngine, scope: str, spec: CompanyFilter) -> None:
+    async with AsyncSession(engine) as session:
+        result = await collect_facets(session, scope, spec)
+        assert result.total == await _count(session, scope, spec)
+        for status in CompanyStatus:
+            assert result.statuses[status] == await _count(session, scope, replace(spec, status=status))
+        for priority in PriorityLevel:
+            assert result.priorities[priority] == await _count(session, scope, replace(spec, priority=priority))
+        for source in CompanySource:
+            assert result.sources[source] == await _count(session, scope, replace(spec, source=source))
+        for (city_id, _), count in result.cities.items():
+            assert count == await _count(session, scope, replace(spec, city_id=city_id))
+        for (niche_id, _), count in result.niches.items():
+            assert count == await _count(session, scope, replace(spec, niche_id=niche_id))
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory: pytest.TempPathFactory) -> AsyncEngine:
+    path: Path = tmp_path_factory.mktemp("facets") / "facets.db"
+    engine = make_engine(f"sqlite+aiosqlite:///{path}")
+    asyncio.run(generate(engine, DatasetSpec.for_size(500, seed=2)))
+    # Строки GROUP BY из кэша могли остаться от базы другого теста
+    facets._cache.clear()
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+@pytest.mark.parametrize("scope", QUERIES)
+@pytest.mark.parametrize("spec", SPECS, ids=CompanyFilter.pack)
+def test_facet_counts_match_filtered_list(engine: AsyncEngine, scope: str, spec: CompanyFilter) -> None:
+    asyncio.run(_check(engine, scope, spec))
@@ -0,0 +1,95 @@
+"""
+Планы SQLite для страниц списков компаний и клиентов при каждом сочетании
+фильтров: после ANALYZE строки должны находиться по индексу и уже идти
+в порядке (created_at, id) — без полного просмотра таблицы и без сортировки
+во временном B-дереве.
+"""
+from __future__ import annotations
+
+from dataclasses import fields
+from datetime import datetime, timedelta
+from itertools import combinations
+from random import Random
+
+import pytest
+from sqlalchemy import Connection, create_engine, text
+from sqlalchemy.orm import Session
+
+from company_filters import CompanyFilter, clients_query, companies_query
+from db import Base
+from models import Client, Company, CompanySource, CompanyStatus, PriorityLevel, Suggestion, SuggestionType
+from pagination import keyset_order
+
+CITIES = ("Алматы", "Астана", "Шымкент", "Караганда", "Актобе")
+NICHES = ("Кафе", "Автосервис", "Стоматология", "Фитнес", "Салон красоты")
+SAMPLE = {
+    "status": CompanyStatus.NOT_CALLED,
+    "priority": PriorityLevel.HIGH,
+    "source": CompanySource.FOUND,
+    "city_id": 1,
+    "niche_id": len(CITIES) + 1,
+}
+LISTS = {"companies": (companies_query, Company), "clients": (clients_query, Client)}
+# Единственный допустимый просмотр: весь список без фильтра, сразу в нужном порядке
+ORDERED_SCANS = {
+    "companies": "SCAN companies USING INDEX ix_companies_created_id",
+    "clients": "SCAN clients USING INDEX ix_clients_created_id",
+}
+
+
+def all_filters() -> list[CompanyFilter]:
+    """Все сочетания полей, по одному значению на поле."""
+    names = [field.name for field in fields(CompanyFilter)]
+    return [
+        CompanyFilter(**{name: SAMPLE[name] for name in chosen})
+        for size in range(len(names) + 1)
+        for chosen in combinations(names, size)
+    ]
+
+
+def _fill(session: Session) -> None:
+    rng = Random(1)
+    session.add_all(Suggestion(type=SuggestionType.CITY, value=value) for value in CITIES)
+    session.add_all(Suggestion(type=SuggestionType.NICHE, value=value) for value in NICHES)
+    started = datetime(2024, 1, 1)
+    for number in range(2000):
+        company = Company(
+            name=f"Компания {number}",
+            phone=f"8701{number:07d}",
+            city=rng.choice(CITIES),
+            niche=rng.choice(NICHES),
+            source=rng.choice(list(CompanySource)),
+            status=rng.choice(list(CompanyStatus)),
+            priority=rng.choice(list(PriorityLevel)),
+            created_at=started + timedelta(minutes=number),
+        )
+        company.clients = [
+            Client(phone=f"8702{number:05d}{index:02d}", name=f"Клиент {number}", created_at=company.created_at)
+            for index in range(2)
+        ]
+        session.add(company)
+
+
+@pytest.fixture(scope="module")
+def connection() -> Connection:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        _fill(session)
+        session.commit()
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        yield conn
+    engine.dispose()
+
+
+@pytest.mark.parametrize("entity", LISTS)
+@pytest.mark.parametrize("spec", all_filters(), ids=CompanyFilter.pack)
+def test_filtered_page_uses_ordered_index(connection: Connection, entity: str, spec: CompanyFilter) -> None:
+    build, model = LISTS[entity]
+    stmt = keyset_order(build(spec), model).limit(10)
+    compiled = stmt.compile(connection, compile_kwargs={"literal_binds": True})
+    plan = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")]
+    allowed_scans = {ORDERED_SCANS[entity]} if spec.is_empty else set()
+    assert not [step for step in plan if step.startswith("SCAN") and step not in allowed_scans], plan
+    assert not [step for step in plan if "TEMP B-TREE" in step], plan
@@ -0,0 +1,92 @@
+"""
+Бюджет запросов горячих обработчиков: сколько SQL-запросов допустимо на один
+вызов независимо от размера базы. Сценарии те же, что в bench.handler_latency;
+каждый прогоняется на синтетических базах двух размеров, и тест падает, если
+обработчик превысил бюджет или число его запросов выросло вместе с базой —
+так ловятся запросы в цикле по строкам.
+"""
+from __future__ import annotations
+
+import asyncio
+from functools import partial
+from pathlib import Path
+from random import Random
+from typing import Callable
+
+import pytest
+
+import facets
+import list_counts
+from bench.dataset import DatasetSpec, generate
+from bench.fake_bot import FakeBot, Operator
+from bench.handler_latency import SCENARIOS, Scenario
+from db import engine
+from instrumentation import StatementCounter
+
+SIZES = (1000, 10000)
+ITERATIONS = 10
+
+# Обработчик -> наибольшее число запросов на вызов (BEGIN не считается)
+QUERY_BUDGETS = {
+    "show_client": 1,
+    "stats": 2,
+    "paginate_companies": 2,
+    "perform_search": 2,
+    "tasks_today": 1,
+}
+
+
+@pytest.fixture(scope="session")
+def statement_counter() -> Callable[[], StatementCounter]:
+    """with statement_counter() as counter: — запросы к db.engine внутри блока."""
+    return partial(StatementCounter, engine)
+
+
+async def _measure(size: int, fake: FakeBot, statement_counter: Callable[[], StatementCounter]) -> dict[str, int]:
+    # Каждый размер — заново в той же базе: db.engine привязан к DATABASE_URL при импорте
+    await engine.dispose()
+    database = Path(engine.url.database)
+    for path in (database, database.with_name(database.name + "-wal"), database.with_name(database.name + "-shm")):
+        path.unlink(missing_ok=True)
+    # Кэши в памяти процесса помнят прошлую базу и спрятали бы запросы
+    list_counts._counts.clear()
+    facets._cache.clear()
+    spec = DatasetSpec.for_size(size, seed=1)
+    await generate(engine, spec)
+
+    operator = Operator(1)
+    rng = Random(1)
+    counts = {}
+    for scenario in SCENARIOS:
+        per_call = []
+        for _ in range(ITERATIONS):
+            *prepare, measured = scenario.steps(operator, rng, spec)
+            for update in prepare:
+                await fake.feed(update)
+            with statement_counter() as counter:
+                handled_by = await fake.feed(measured)
+            assert handled_by == scenario.handler
+            per_call.append(counter.count)
+        counts[scenario.handler] = max(per_call)
+    await engine.dispose()
+    return counts
+
+
+@pytest.fixture(scope="session")
+def query_counts(statement_counter: Callable[[], StatementCounter]) -> dict[int, dict[str, int]]:
+    """Размер базы -> обработчик -> наибольшее число запросов на вызов."""
+    # handlers.router подключается к одному Dispatcher — FakeBot один на все размеры
+    fake = FakeBot()
+    return {size: asyncio.run(_measure(size, fake, statement_counter)) for size in SIZES}
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("handler", QUERY_BUDGETS)
+def test_handler_within_query_budget(query_counts: dict[int, dict[str, int]], size: int, handler: str) -> None:
+    assert query_counts[size][handler] <= QUERY_BUDGETS[handler]
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS, ids=lambda scenario: scenario.handler)
+def test_query_count_does_not_grow_with_data(query_counts: dict[int, dict[str, int]], scenario: Scenario) -> None:
+    counts = [query_counts[size][scenario.handler] for size in SIZES]
+    assert counts[-1] <= counts[0], dict(zip(SIZES, counts))
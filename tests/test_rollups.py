@@ -0,0 +1,50 @@
+"""
+Агрегаты (rollups) читают строки по возрастанию id после контрольной точки:
+новая строка должна попасть в них, даже если перед ней удалили последнюю.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.orm import Session
+
+from db import Base
+from models import Client, ClientStatus, DailyInteractionRollup, Interaction, InteractionResult
+from rollups import roll_up
+
+
+def _interaction(client: Client) -> Interaction:
+    return Interaction(
+        client=client,
+        created_at=datetime(2024, 1, 1, 12),
+        result=InteractionResult.CALL,
+        status_after=ClientStatus.THINKING,
+    )
+
+
+def _roll_up_all(session: Session) -> None:
+    while roll_up(session.connection()):
+        pass
+    session.commit()
+
+
+def test_row_after_deleted_newest_is_rolled_up() -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        client = Client(phone="+77010000001", name="Клиент")
+        session.add_all([_interaction(client), _interaction(client)])
+        session.commit()
+        _roll_up_all(session)
+
+        newest = session.scalar(select(func.max(Interaction.id)))
+        session.execute(delete(Interaction).where(Interaction.id == newest))
+        added = _interaction(client)
+        session.add(added)
+        session.commit()
+        _roll_up_all(session)
+
+        assert added.id > newest
+        assert session.scalar(select(func.sum(DailyInteractionRollup.count))) == 3
+    engine.dispose()
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from config import TIMEZONE
+
+# В базе время хранится в UTC без tzinfo (datetime.utcnow), операторам показываем местное
+OPERATOR_TZ = ZoneInfo(TIMEZONE)
+
+
+def to_local(moment: datetime) -> datetime:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(OPERATOR_TZ)
+
+
+def naive_utc(moment: datetime) -> datetime:
+    """
+    Значение из БД -> наивное UTC: Postgres отдаёт timestamptz с tzinfo,
+    SQLite — без, и сравнивать их с datetime.utcnow() напрямую нельзя.
+    """
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def to_utc(moment: datetime) -> datetime:
+    """Местное (или любое aware) время -> наивное UTC, как в колонках БД."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=OPERATOR_TZ)
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def local_today(now: datetime | None = None) -> date:
+    return to_local(now or datetime.utcnow()).date()
+
+
+def local_day_bounds(day: date | None = None) -> tuple[datetime, datetime]:
+    """Полуоткрытый интервал [начало дня, начало следующего дня) оператора в UTC."""
+    day = day or local_today()
+    start = datetime.combine(day, time.min, tzinfo=OPERATOR_TZ)
+    end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=OPERATOR_TZ)
+    return to_utc(start), to_utc(end)
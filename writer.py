@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import WRITE_BATCH_LINGER, WRITE_BATCH_MAX
+from db import async_session_maker
+from instrumentation import current_handler
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+WriteOp = Callable[[AsyncSession], Awaitable[T]]
+# Операция, её результат для вызывающего и обработчик, от имени которого она поставлена
+QueuedWrite = tuple[WriteOp, asyncio.Future, str]
+
+
+class WriteQueue:
+    """
+    Единственный писатель: операции записи из разных обработчиков собираются
+    в пачку за WRITE_BATCH_LINGER секунд и коммитятся одной транзакцией — один
+    fsync и одна блокировка SQLite на пачку. Каждая операция идёт в своём
+    SAVEPOINT, поэтому ошибка одной откатывает только её и достаётся только
+    её вызывающему. Чтение через get_session() идёт мимо очереди.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+        max_batch: int = WRITE_BATCH_MAX,
+        linger: float = WRITE_BATCH_LINGER,
+    ) -> None:
+        self._session_maker = session_maker
+        self._max_batch = max_batch
+        self._linger = linger
+        # None в очереди — сигнал остановки
+        self._queue: asyncio.Queue[QueuedWrite | None] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Дописывает уже поставленные операции и останавливает писателя."""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, op: WriteOp[T]) -> T:
+        """Выполняет op(session) в транзакции и возвращает её результат после коммита."""
+        if self._task is None:
+            # Очередь не запущена (скрипты, фоновые пересчёты): своя транзакция
+            async with self._session_maker() as session:
+                result = await op(session)
+                await session.commit()
+                return result
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((op, future, current_handler.get()))
+        return await future
+
+    async def _next_batch(self) -> tuple[list[QueuedWrite], bool]:
+        """Пачка операций и признак того, что после неё пора остановиться."""
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        # Под нагрузкой очередь не пуста и ждать незачем; одиночную запись
+        # чуть придерживаем, чтобы к ней успели присоединиться соседи
+        if self._queue.empty():
+            await asyncio.sleep(self._linger)
+        while len(batch) < self._max_batch and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _write_batch(self, batch: list[QueuedWrite]) -> None:
+        outcomes: list[tuple[asyncio.Future, object, BaseException | None]] = []
+        try:
+            async with self._session_maker() as session:
+                for op, future, handler in batch:
+                    # Запросы операции в статистике числятся за поставившим её обработчиком
+                    token = current_handler.set(handler)
+                    try:
+                        async with session.begin_nested():
+                            result = await op(session)
+                        outcomes.append((future, result, None))
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+                    finally:
+                        current_handler.reset(token)
+                await session.commit()
+        except Exception as exc:
+            logger.exception("Write batch of %s operations failed", len(batch))
+            outcomes = [(future, None, exc) for _, future, _ in batch]
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def _run(self) -> None:
+        # Общий коммит пачки не принадлежит ни одному обработчику
+        current_handler.set("write_queue")
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if batch:
+                await self._write_batch(batch)
+
+
+write_queue = WriteQueue()